@@ -1,5 +1,26 @@
-import matplotlib.pyplot as plt
+import base64
+import io
+import re
+from contextlib import contextmanager
+
+import matplotlib.image as mpimg
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib import rc_context
+from matplotlib.figure import Figure
+from PIL import Image
+
+from Curves import (
+    CONVERSION_FACTOR,
+    IMMUNOGLOBULINS,
+    UPPER_LINERS,
+    X_MAX,
+    X_MIN,
+    Y_MAX,
+    Y_MIN,
+)
+from Quotients import parse_quotient
+from Timing import stage
 
 # Hansotto Reiber
 # Reiber, H. (1994). Flow rate of cerebrospinal fluid (CSF) —
@@ -9,53 +30,108 @@ import numpy as np
 
 
 # Limiting Functions
+IGG_UPPER = IMMUNOGLOBULINS["IgG"].upper
+IGG_LOWER = IMMUNOGLOBULINS["IgG"].lower
+
+
 def high(x):
-    q_igg_value = 0.93 * (np.sqrt(x**2 + 6e-6)) - 1.7e-3
-    return q_igg_value
+    return IGG_UPPER.eval(x)
 
 
 def low(x):
-    s_igg_value = 0.33 * (np.sqrt(x**2 + 2e-6)) - 0.3e-3
-    return s_igg_value
+    return IGG_LOWER.eval(x)
 
 
 # Constants
-CONVERSION_FACTOR = 1e-3
 QALB_MIN = 0
 QALB_MAX = 130e-3
-X_MIN = 1.5e-3
-X_MAX = 130e-3
-Y_MIN = 0.3e-3
-Y_MAX = 130e-3
-Y_TICKS = [0.5e-3, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3]
-X_TICKS = [2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3]
-Y_TICKS_L = [".5", 1, 2, 5, 10, 20, 50, "$\mathregular{100_{x10^{-3}}}$"]
-X_TICKS_L = [2, 5, 10, "$\mathregular{20_{x10^{-3}}}$", 50, 100]
-q_alb_values = np.linspace(QALB_MIN, QALB_MAX, 1000)
-q_igg_values = 0.93 * (np.sqrt(q_alb_values**2 + 6e-6)) - 1.7e-3
-s_igg_values = 0.33 * (np.sqrt(q_alb_values**2 + 2e-6)) - 0.3e-3
-
-twenty_igg_values = q_igg_values / 0.8
-fourty_igg_values = q_igg_values / 0.6
-sixty_igg_values = q_igg_values / 0.4
-eighty_igg_values = q_igg_values / 0.2
-
-vertical_lines_x = [5e-3, 6.5e-3, 8e-3]
-vertical_ymax = [
-    high(vertical_lines_x[0]),
-    high(vertical_lines_x[1]),
-    high(vertical_lines_x[2]),
-]
-vertical_ymin = [2.3e-3, 3.2e-3, 2.4e-3]
-top_limit = [twenty_igg_values, fourty_igg_values, sixty_igg_values, eighty_igg_values]
-upper_liners = ["20", "40", "60", "80%"]
+
+# Raster diagrams of the Word report: the size of their table cells in
+# inches, and the resolution they are printed at
+REPORT_SIZE = (6.6 / 2.54, 6.4 / 2.54)
+REPORT_DPI = 300
+
+
+def make_palette():
+    """
+    Return the indexed palette of the report diagrams: 16 grays for the
+    black on white chart and 15 shades of each overlay color towards white
+    for the antialiased guide lines and point.
+    """
+    colors = [np.full(3, level) for level in np.linspace(0, 1, 16)]
+    for color in ((0, 0, 1), (0, 0.5, 0), (1, 0, 0)):
+        color = np.array(color)
+        colors += [color + (1 - color) * level for level in np.linspace(0, 1, 16)[:-1]]
+    palette = Image.new("P", (1, 1))
+    palette.putpalette(np.round(np.array(colors) * 255).astype(np.uint8).tobytes())
+    return palette
+
+
+PALETTE = make_palette()
+
+# Vector output: simplified paths, text kept as text in the subsetted fonts
+# embedded by font_faces (SVG) and Vector (PDF), and stable ids
+VECTOR_RC = {
+    "path.simplify": True,
+    "svg.fonttype": "none",
+    "svg.hashsalt": "Reibergram",
+}
+# QAlb samples for drawing the curves, evenly spaced on the log axis
+q_alb_values = np.geomspace(X_MIN, X_MAX, 256)
 
 # Functions
 
 
-def text_at_position(upper, label):
-    plt.text(
-        np.interp(100e-3, upper, q_alb_values),
+def font_faces(figure):
+    """
+    Return CSS @font-face rules embedding the fonts of a figure's text in an
+    SVG, each subset to the characters the figure uses, as WOFF.
+    """
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+    from matplotlib.cbook import is_math_text
+    from matplotlib.font_manager import findfont, ttfFontProperty
+    from matplotlib.ft2font import FT2Font
+    from matplotlib.mathtext import MathTextParser
+    from matplotlib.text import Text
+
+    characters = {}
+    parser = MathTextParser("path")
+    for text in figure.findobj(Text):
+        string = text.get_text()
+        if not string or not text.get_visible():
+            continue
+        prop = text.get_fontproperties()
+        if is_math_text(string):
+            for font, _, code, *_ in parser.parse(string, 72, prop).glyphs:
+                characters.setdefault(font.fname, set()).add(chr(code))
+        else:
+            characters.setdefault(str(findfont(prop)), set()).update(string)
+
+    rules = []
+    for path, used in sorted(characters.items()):
+        entry = ttfFontProperty(FT2Font(path))
+        options = subset.Options()
+        options.drop_tables += ["FFTM"]
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(text="".join(sorted(used)))
+        font = TTFont(path)
+        subsetter.subset(font)
+        font.flavor = "woff"
+        buffer = io.BytesIO()
+        font.save(buffer)
+        data = base64.b64encode(buffer.getvalue()).decode()
+        rules.append(
+            f"@font-face {{font-family: '{entry.name}'; font-weight: {entry.weight}; "
+            f"font-style: {entry.style}; "
+            f"src: url(data:font/woff;base64,{data}) format('woff')}}"
+        )
+    return "\n".join(rules)
+
+
+def text_at_position(ax, upper, label):
+    ax.text(
+        upper.inverse(100e-3),
         100e-3,
         label,
         ha="right",
@@ -64,90 +140,116 @@ def text_at_position(upper, label):
     )
 
 
-def define_lines():
+def define_lines(ax, ig):
     """
-    Calculate QAlb, QIgG, and SIgG values.
+    Draw the upper and lower limiting curves, the percentage lines and the grid.
 
-    Returns:
-        q_alb_values (numpy.ndarray): Array of QAlb values.
-        q_igg_values (numpy.ndarray): Array of QIgG values.
-        s_igg_values (numpy.ndarray): Array of SIgG values.
+    Args:
+        ax (matplotlib.axes.Axes): Axes prepared by main_plot_setup.
+        ig (Curves.Immunoglobulin): Parameter set of the diagram.
     """
+    upper, lower = ig.upper, ig.lower
 
-    plt.plot(q_alb_values, q_igg_values, color="black", linewidth=2)
-    plt.plot(q_alb_values, s_igg_values, color="black", linewidth=1)
+    ax.plot(q_alb_values, upper.eval(q_alb_values), color="black", linewidth=2)
+    ax.plot(q_alb_values, lower.eval(q_alb_values), color="black", linewidth=1)
 
-    for values in top_limit:
-        plt.plot(q_alb_values, values, color="black", linewidth=1, linestyle="--")
+    for curve in ig.top_limit:
+        ax.plot(
+            q_alb_values,
+            curve.eval(q_alb_values),
+            color="black",
+            linewidth=1,
+            linestyle="--",
+        )
 
-    for p, n in zip(top_limit, upper_liners):
-        text_at_position(p, n)
+    for p, n in zip(ig.top_limit, UPPER_LINERS):
+        text_at_position(ax, p, n)
 
-    # X grid
-    gridline_x_positions = [x for x in plt.xticks()[0] if x >= 8e-3] + [
-        x for x in plt.xticks(minor=True)[0] if x >= 8e-3
-    ]
-    ymin = [low(x) for x in gridline_x_positions]
-    ymax = [high(x) for x in gridline_x_positions]
+    vertical, horizontal = grid_lines(
+        ig,
+        [*ax.get_xticks(), *ax.get_xticks(minor=True)],
+        [*ax.get_yticks(), *ax.get_yticks(minor=True)],
+    )
+    for x, y1, y2 in zip(*vertical):
+        ax.plot([x, x], [y1, y2], color="black", linewidth=0.5, linestyle="-")
+    ax.hlines(*horizontal, color="black", linewidth=0.5, linestyle="-")
+
+
+def grid_lines(ig, x_ticks, y_ticks):
+    """
+    Return the grid between the limiting curves, right of the 8e-3 line.
 
-    for x, y1, y2 in zip(gridline_x_positions, ymin, ymax):
-        plt.plot([x, x], [y1, y2], color="black", linewidth=0.5, linestyle="-")
+    Args:
+        ig (Curves.Immunoglobulin): Parameter set of the diagram.
+        x_ticks (list): Major and minor QAlb ticks of the diagram.
+        y_ticks (list): Major and minor QIg ticks of the diagram.
+
+    Returns:
+        tuple: x, lower y and upper y of the vertical gridlines, and y, left
+        x and right x of the horizontal ones.
+    """
+    upper, lower = ig.upper, ig.lower
+
+    # X grid
+    gridline_x_positions = [x for x in x_ticks if x >= 8e-3]
+    ymin = [lower.eval(x) for x in gridline_x_positions]
+    ymax = [upper.eval(x) for x in gridline_x_positions]
 
     # Y grid
-    gridline_y_positions = [
-        y for y in plt.yticks()[0] if y >= low(8e-3) and y < high(130e-3)
-    ] + [y for y in plt.yticks(minor=True)[0] if y >= low(8e-3) and y < high(130e-3)]
-
-    for y in gridline_y_positions:
-        xinterp_max = np.interp(y, s_igg_values, q_alb_values)
-        xinterp_min = np.interp(y, q_igg_values, q_alb_values)
-        if xinterp_min < 8e-3:
-            xinterp_min = 8e-3
-        plt.hlines(
-            y,
-            xmin=xinterp_min,
-            xmax=xinterp_max,
-            color="black",
-            linewidth=0.5,
-            linestyle="-",
-        )
+    y_min, y_max = lower.eval(8e-3), upper.eval(130e-3)
+    gridline_y_positions = np.array([y for y in y_ticks if y >= y_min and y < y_max])
+
+    # Exact intersections with the limiting curves, clipped at the 8e-3 line
+    return (gridline_x_positions, ymin, ymax), (
+        gridline_y_positions,
+        np.fmax(upper.inverse(gridline_y_positions), 8e-3),
+        lower.inverse(gridline_y_positions),
+    )
 
 
-def draw_vertical_lines():
+def draw_vertical_lines(ax, ig):
     """
     Draw vertical lines on the plot.
 
-    Vertical lines are defined by the constants VERTICAL_LINES_X, YMIN, and YMAX.
+    Vertical lines are defined by vertical_lines_x, vertical_ymin and
+    vertical_ymax of the immunoglobulin.
     """
 
-    for x, y1, y2 in zip(vertical_lines_x, vertical_ymin, vertical_ymax):
-        plt.plot([x, x], [y1, y2], color="black", linewidth=2, linestyle="-")
+    for x, y1, y2 in zip(ig.vertical_lines_x, ig.vertical_ymin, ig.vertical_ymax):
+        ax.plot([x, x], [y1, y2], color="black", linewidth=2, linestyle="-")
 
 
 def get_input():
     """
-    Get user input for QIgG and QAlb values.
+    Get user input for QIgG and QAlb values, typed x 10^-3 or as CSF and
+    serum concentrations with their units, see Quotients.parse_quotient.
 
     Returns:
         Qigg (float): QIgG value.
         Qalbumin (float): QAlb value.
     """
     while True:
-        user_input = input("Enter a QIgG value or 'exit': ")
+        user_input = input(
+            "Enter a QIgG value, CSF and serum IgG such as '28 mg/l 10 g/l', "
+            "or 'exit': "
+        )
         if user_input.lower() == "exit":
             raise SystemExit(0)
         try:
-            Qigg = float(user_input) * CONVERSION_FACTOR
+            Qigg = parse_quotient(user_input) * CONVERSION_FACTOR
             break  # Exit the loop if QIgG is valid
         except ValueError:
             print("Please enter a valid QIgG value.")
 
     while True:
-        user_input = input("Enter a QAlb value or 'exit': ")
+        user_input = input(
+            "Enter a QAlb value, CSF and serum albumin such as '280 mg/l 40 g/l', "
+            "or 'exit': "
+        )
         if user_input.lower() == "exit":
             raise SystemExit(0)
         try:
-            Qalbumin = float(user_input) * CONVERSION_FACTOR
+            Qalbumin = parse_quotient(user_input) * CONVERSION_FACTOR
             break  # Exit the loop if QAlb is valid
         except ValueError:
             print("Please enter a valid QAlb value.")
@@ -155,40 +257,28 @@ def get_input():
     return Qigg, Qalbumin
 
 
-def main_plot_setup(Qigg, Qalbumin):
+def main_plot_setup(ax, ig):
     """
     Set up the main plot with labels, ticks, and legends.
 
     Args:
-        Qigg (float): QIgG value.
-        Qalbumin (float): QAlb value.
+        ax (matplotlib.axes.Axes): Axes to draw the static diagram on.
+        ig (Curves.Immunoglobulin): Parameter set of the diagram.
     """
-    plt.figure(figsize=(6, 6))
-
-    plt.semilogx(
-        [Qalbumin, Qalbumin],
-        [0, Qigg],
-        color="b",
-        linestyle="solid",
-    )
-    plt.semilogy(
-        [0, Qalbumin],
-        [Qigg, Qigg],
-        color="g",
-        linestyle="solid",
-    )
+    ax.set_xscale("log")
+    ax.set_yscale("log")
 
-    plt.xlim(X_MIN, X_MAX)
-    plt.ylim(Y_MIN, Y_MAX)
+    ax.set_xlim(X_MIN, X_MAX)
+    ax.set_ylim(Y_MIN, Y_MAX)
 
-    plt.xticks(X_TICKS, X_TICKS_L)
-    plt.yticks(Y_TICKS, Y_TICKS_L)
+    ax.set_xticks(ig.x_ticks, ig.x_ticks_l)
+    ax.set_yticks(ig.y_ticks, ig.y_ticks_l)
 
-    plt.minorticks_on()
-    plt.xticks(np.append(plt.xticks()[0], [15e-3, 1.5e-3]))
-    plt.yticks(np.append(plt.yticks()[0], [15e-3, 1.5e-3]))
+    ax.minorticks_on()
+    ax.set_xticks(np.append(ax.get_xticks(), [15e-3, 1.5e-3]))
+    ax.set_yticks(np.append(ax.get_yticks(), [15e-3, 1.5e-3]))
 
-    plt.tick_params(
+    ax.tick_params(
         axis="x",
         which="both",
         length=8,
@@ -196,17 +286,17 @@ def main_plot_setup(Qigg, Qalbumin):
         direction="in",
         pad=-8,
     )
-    plt.tick_params(axis="y", which="both", length=8, width=1.5, direction="in", pad=-9)
+    ax.tick_params(axis="y", which="both", length=8, width=1.5, direction="in", pad=-9)
 
-    for tick in plt.gca().yaxis.get_majorticklabels():
+    for tick in ax.yaxis.get_majorticklabels():
         tick.set_horizontalalignment("left")
-    for tick in plt.gca().xaxis.get_majorticklabels():
+    for tick in ax.xaxis.get_majorticklabels():
         tick.set_verticalalignment("bottom")
 
-    plt.text(
+    ax.text(
         3e-3,
         60e-3,
-        "QIgG",
+        ig.label,
         ha="center",
         va="center",
         fontsize=15,
@@ -214,7 +304,7 @@ def main_plot_setup(Qigg, Qalbumin):
         alpha=1,
         weight="bold",
     )
-    plt.text(
+    ax.text(
         60e-3,
         0.65e-3,
         "QAlb",
@@ -226,23 +316,497 @@ def main_plot_setup(Qigg, Qalbumin):
         weight="bold",
     )
 
-    plt.scatter(Qalbumin, Qigg, color="r")
-    plt.grid(False)
+    ax.grid(False)
+
+
+class ReibergramRenderer:
+    """
+    Draw the static Reibergram once and blit the patient overlay onto a copy.
+
+    The curves, percentage lines, gridlines and vertical lines never change
+    between patients, so they are rendered a single time into an Agg canvas
+    and kept as a background. Each render only restores that background and
+    draws the two guide lines and the patient point on top of it.
+
+    Args:
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        dpi (float): Resolution of the images.
+        size (tuple): Width and height of the images in inches, the diagram
+            is then laid out to fill them, see fit. None keeps the original
+            6 inch figure, cropped like savefig(bbox_inches="tight").
+    """
+
+    def __init__(self, ig="IgG", dpi=100, size=None):
+        self.ig = IMMUNOGLOBULINS[ig]
+        self.dpi = dpi
+        self.figure = Figure(figsize=(6, 6), dpi=dpi)
+        self.figure.set_gid("reibergram")
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+
+        with stage("render.setup", ig=ig):
+            main_plot_setup(self.ax, self.ig)
+        with stage("render.lines", ig=ig):
+            define_lines(self.ax, self.ig)
+            draw_vertical_lines(self.ax, self.ig)
+
+        # Patient overlay, skipped by canvas.draw() and blitted per render
+        (self.vertical_line,) = self.ax.plot(
+            [], [], color="b", linestyle="solid", animated=True
+        )
+        (self.horizontal_line,) = self.ax.plot(
+            [], [], color="g", linestyle="solid", animated=True
+        )
+        self.point = self.ax.scatter([], [], color="r", animated=True)
+
+        # Serial samples of one patient, a single line with a marker per sample
+        (self.trajectory,) = self.ax.plot(
+            [], [], color="r", linestyle="solid", marker="o", animated=True
+        )
+        self.overlay = (
+            self.vertical_line,
+            self.horizontal_line,
+            self.point,
+            self.trajectory,
+        )
+        self.svg_background = None
+        self.vector_background = None
+
+        if size is not None:
+            with stage("render.fit", ig=ig):
+                self.fit(*size)
+
+        with stage("render.background", ig=ig):
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+        if size is not None:
+            # The whole canvas is the image
+            columns, rows = self.canvas.get_width_height()
+            self.tight_bbox = self.figure.bbox_inches
+            self.crop = (slice(0, rows), slice(0, columns))
+            return
+
+        # Same crop as savefig(bbox_inches="tight"), measured only once
+        with stage("render.tight_bbox", ig=ig):
+            renderer = self.canvas.get_renderer()
+            bbox = self.figure.get_tightbbox(renderer).padded(0.1)
+        self.tight_bbox = bbox
+        height = self.figure.bbox.height
+        self.crop = (
+            slice(
+                max(int(round(height - bbox.y1 * dpi)), 0),
+                int(round(height - bbox.y0 * dpi)),
+            ),
+            slice(max(int(round(bbox.x0 * dpi)), 0), int(round(bbox.x1 * dpi))),
+        )
+
+    def fit(self, width, height):
+        """
+        Lay the figure out to fill an image of a fixed physical size.
+
+        The margins of the axes are measured once around the tick labels,
+        as savefig(bbox_inches="tight") would crop them, and the figure is
+        shrunk to them. The axes take up the difference between the aspect
+        ratios, and the resolution is raised so that the image is width
+        inches at self.dpi, text and lines scaling like a resized image.
+        Every render is then a single draw of the whole canvas, no crop.
+
+        Args:
+            width (float): Image width in inches.
+            height (float): Image height in inches.
+        """
+        renderer = self.canvas.get_renderer()
+        bbox = self.figure.get_tightbbox(renderer).padded(0.1)
+        to_inches = self.figure.transFigure - self.figure.dpi_scale_trans
+        axes = self.ax.get_position().transformed(to_inches)
+        # Whole pixels, the canvas would truncate them
+        pixels = round(width * self.dpi), round(height * self.dpi)
+        render_dpi = pixels[0] / bbox.width
+        figure_width, figure_height = bbox.width, pixels[1] / render_dpi
+
+        left = axes.x0 - bbox.x0
+        bottom = axes.y0 - bbox.y0
+        self.figure.set_size_inches(figure_width, figure_height)
+        self.figure.set_dpi(render_dpi)
+        self.ax.set_position(
+            [
+                left / figure_width,
+                bottom / figure_height,
+                (figure_width - left - (bbox.x1 - axes.x1)) / figure_width,
+                (figure_height - bottom - (bbox.y1 - axes.y1)) / figure_height,
+            ]
+        )
+
+    def render(self, Qig=None, Qalbumin=None):
+        """
+        Composite the patient overlay onto the cached background.
+
+        Args:
+            Qig (float): QIgG, QIgA or QIgM value, None for the bare diagram.
+            Qalbumin (float): QAlb value.
+
+        Returns:
+            numpy.ndarray: Cropped RGBA image of the Reibergram.
+        """
+        with stage("render.blit", ig=self.ig.name):
+            self.canvas.restore_region(self.background)
+            if Qig is not None:
+                self.draw_guides(Qig, Qalbumin)
+                self.point.set_offsets([[Qalbumin, Qig]])
+                self.ax.draw_artist(self.point)
+            return np.asarray(self.canvas.buffer_rgba())[self.crop].copy()
+
+    def draw_guides(self, Qig, Qalbumin):
+        """
+        Draw the blue and green guide lines from the axes to a sample.
+        """
+        self.vertical_line.set_data([Qalbumin, Qalbumin], [0, Qig])
+        self.horizontal_line.set_data([0, Qalbumin], [Qig, Qig])
+        for artist in (self.vertical_line, self.horizontal_line):
+            self.ax.draw_artist(artist)
+
+    def render_trajectory(self, Qig, Qalbumin, order=None):
+        """
+        Composite the serial samples of a patient onto the cached background,
+        connected in time order, with the guide lines at the latest sample.
+
+        Args:
+            Qig (array_like): QIgG, QIgA or QIgM values.
+            Qalbumin (array_like): QAlb values, same length as Qig.
+            order (array_like): Sampling times or dates to sort the samples
+                by, None if they are already in time order.
+
+        Returns:
+            numpy.ndarray: Cropped RGBA image of the Reibergram.
+        """
+        Qig = np.asarray(Qig, dtype=float)
+        Qalbumin = np.asarray(Qalbumin, dtype=float)
+        if order is not None:
+            index = np.argsort(order, kind="stable")
+            Qig, Qalbumin = Qig[index], Qalbumin[index]
+        finite = np.isfinite(Qig) & np.isfinite(Qalbumin)
+        Qig, Qalbumin = Qig[finite], Qalbumin[finite]
+
+        self.canvas.restore_region(self.background)
+        if len(Qig):
+            self.draw_guides(Qig[-1], Qalbumin[-1])
+            self.trajectory.set_data(Qalbumin, Qig)
+            self.ax.draw_artist(self.trajectory)
+        return np.asarray(self.canvas.buffer_rgba())[self.crop].copy()
+
+    def render_density(self, density, Qig=None, Qalbumin=None):
+        """
+        Composite a cohort density layer and the patient overlay onto the
+        cached background.
+
+        The layer is multiplied into the background, which keeps the black
+        curves and tints only the white paper, as if it were drawn under them.
+        Its cost depends on the image size, not on the number of samples.
+
+        Args:
+            density (Density.Density): Cohort histogram.
+            Qig (float): QIgG, QIgA or QIgM value, None for no patient.
+            Qalbumin (float): QAlb value.
+
+        Returns:
+            numpy.ndarray: Cropped RGBA image of the Reibergram.
+        """
+        with stage("render.density", ig=self.ig.name):
+            self.canvas.restore_region(self.background)
+            buffer = np.asarray(self.canvas.buffer_rgba())
+
+            # Bin of each pixel of the axes, the top row first
+            x0, y0, x1, y1 = self.ax.bbox.extents
+            height = self.figure.bbox.height
+            top, bottom = int(round(height - y1)), int(round(height - y0))
+            left, right = int(round(x0)), int(round(x1))
+            rows = (np.arange(bottom - top) + 0.5) * density.bins // (bottom - top)
+            columns = (np.arange(right - left) + 0.5) * density.bins // (right - left)
+            layer = density.colors()[
+                rows.astype(np.intp)[:, None], columns.astype(np.intp)
+            ]
+
+            area = buffer[top:bottom, left:right, :3]
+            area[...] = area.astype(np.uint16) * layer // 255
+
+            if Qig is not None:
+                self.draw_guides(Qig, Qalbumin)
+                self.point.set_offsets([[Qalbumin, Qig]])
+                self.ax.draw_artist(self.point)
+            return buffer[self.crop].copy()
+
+    def save(self, Qig, Qalbumin, fname):
+        image = self.render(Qig, Qalbumin)
+        with stage("render.encode", ig=self.ig.name):
+            mpimg.imsave(fname, image, format="png", dpi=self.dpi)
+
+    def png(self, Qig=None, Qalbumin=None):
+        """
+        Return the rendered Reibergram as PNG bytes, without touching the disk.
+        """
+        buffer = io.BytesIO()
+        self.save(Qig, Qalbumin, buffer)
+        return buffer.getvalue()
+
+    def palette_png(self, Qig=None, Qalbumin=None):
+        """
+        Return the rendered Reibergram as an indexed-color PNG, a fraction
+        of the size and encoding time of the RGBA one.
+        """
+        image = self.render(Qig, Qalbumin)
+        with stage("render.encode", ig=self.ig.name):
+            indexed = Image.fromarray(image[..., :3]).quantize(
+                palette=PALETTE, dither=Image.Dither.NONE
+            )
+            buffer = io.BytesIO()
+            indexed.save(buffer, format="png", dpi=(self.dpi, self.dpi))
+        return buffer.getvalue()
+
+    @contextmanager
+    def showing(self, *artists):
+        """
+        Hide the overlay artists other than artists, which savefig would
+        otherwise draw with the data of the last render.
+        """
+        hidden = [artist for artist in self.overlay if artist not in artists]
+        for artist in hidden:
+            artist.set_visible(False)
+        try:
+            yield
+        finally:
+            for artist in hidden:
+                artist.set_visible(True)
+
+    def svg(self, Qig=None, Qalbumin=None):
+        """
+        Return the Reibergram as SVG bytes.
+
+        The static diagram is exported once, as the "reibergram" group, and
+        only the patient overlay group is written per call.
+        """
+        with stage("render.svg", ig=self.ig.name):
+            if self.svg_background is None:
+                self.svg_background = self.static_svg()
+            overlay = "" if Qig is None else self.svg_overlay(Qig, Qalbumin)
+            return (self.svg_background + overlay + "</svg>\n").encode()
+
+    def static_svg(self):
+        """
+        Export the diagram without the overlay, cropped like the PNG and
+        without its closing tag, with its fonts subset and embedded.
+        """
+        buffer = io.BytesIO()
+        with self.showing(), rc_context(VECTOR_RC):
+            self.figure.savefig(buffer, format="svg", metadata={"Date": None})
+        svg = buffer.getvalue().decode()
+
+        x0, y0, width, height = self.svg_box(self.tight_bbox, inches=True)
+        svg = re.sub(
+            r'<svg ([^>]*?)width="[^"]*" height="[^"]*" viewBox="[^"]*"',
+            rf'<svg \1width="{width:.2f}pt" height="{height:.2f}pt" '
+            rf'viewBox="{x0:.2f} {y0:.2f} {width:.2f} {height:.2f}"',
+            svg,
+            count=1,
+        )
+        # Text is kept as text, in its fonts embedded next to the styles
+        style = f'<style type="text/css">{font_faces(self.figure)}</style>'
+        end = svg.index("</style>") + len("</style>")
+        svg = svg[:end] + "\n  " + style + svg[end:]
+        return svg[: svg.rindex("</svg>")]
+
+    def svg_box(self, bbox, inches=False):
+        """
+        Convert a bounding box to SVG points, origin at the top left.
+
+        Returns:
+            tuple: x, y, width and height.
+        """
+        scale = 72 if inches else 72 / self.figure.dpi
+        top = self.figure.bbox.height * 72 / self.figure.dpi
+        return (
+            bbox.x0 * scale,
+            top - bbox.y1 * scale,
+            bbox.width * scale,
+            bbox.height * scale,
+        )
+
+    def svg_overlay(self, Qig, Qalbumin):
+        """
+        Draw the guide lines and the patient point as an SVG group.
+        """
+        x_left, y_bottom = self.ax.get_xlim()[0], self.ax.get_ylim()[0]
+        points = self.ax.transData.transform(
+            [[Qalbumin, y_bottom], [Qalbumin, Qig], [x_left, Qig]]
+        )
+        scale = 72 / self.figure.dpi
+        top = self.figure.bbox.height * scale
+        (xb, yb), (xp, yp), (xl, yl) = [
+            (f"{x * scale:.2f}", f"{top - y * scale:.2f}") for x, y in points
+        ]
+        x, y, width, height = self.svg_box(self.ax.bbox)
+        return (
+            '<g id="patient">\n'
+            f'<clipPath id="patient-clip"><rect x="{x:.2f}" y="{y:.2f}" '
+            f'width="{width:.2f}" height="{height:.2f}"/></clipPath>\n'
+            '<g clip-path="url(#patient-clip)" '
+            'style="fill:none;stroke-width:1.5;stroke-linecap:square">\n'
+            f'<path d="M {xb} {yb} L {xp} {yp}" style="stroke:#0000ff"/>\n'
+            f'<path d="M {xl} {yl} L {xp} {yp}" style="stroke:#008000"/>\n'
+            f'<circle cx="{xp}" cy="{yp}" r="3" '
+            'style="fill:#ff0000;stroke:#ff0000;stroke-width:1"/>\n'
+            "</g>\n</g>\n"
+        )
+
+    def vector(self):
+        """
+        Return the static diagram as a Vector.Drawing, cropped like the PNG.
+        It is recorded on first use, with simplified paths.
+        """
+        if self.vector_background is None:
+            from Vector import record
+
+            with stage("render.vector", ig=self.ig.name):
+                with self.showing(), rc_context(VECTOR_RC):
+                    self.vector_background = record(self.figure, self.tight_bbox)
+        return self.vector_background
+
+    def draw_pdf_overlay(self, canvas, Qig, Qalbumin):
+        """
+        Draw the guide lines and the patient point on a reportlab canvas, in
+        the points of the vector diagram.
+        """
+        drawing = self.vector()
+        (left, bottom), (right, top) = drawing.locate(self.ax.bbox.get_points())
+        ((x, y),) = drawing.locate(self.ax.transData.transform([[Qalbumin, Qig]]))
+        canvas.saveState()
+        clip = canvas.beginPath()
+        clip.rect(left, bottom, right - left, top - bottom)
+        canvas.clipPath(clip, stroke=0, fill=0)
+        canvas.setLineWidth(1.5)
+        canvas.setLineCap(2)
+        canvas.setStrokeColorRGB(0, 0, 1)
+        canvas.line(x, bottom, x, y)
+        canvas.setStrokeColorRGB(0, 0.5, 0)
+        canvas.line(left, y, x, y)
+        canvas.setLineWidth(1)
+        canvas.setStrokeColorRGB(1, 0, 0)
+        canvas.setFillColorRGB(1, 0, 0)
+        canvas.circle(x, y, 3, stroke=1, fill=1)
+        canvas.restoreState()
+
+    def pdf(self, Qig=None, Qalbumin=None):
+        """
+        Return the Reibergram as PDF bytes with vector paths and subsetted
+        TrueType fonts.
+
+        The static diagram is recorded once, see vector, and written as a
+        form XObject, only the patient overlay is drawn per call.
+        """
+        from reportlab.pdfgen.canvas import Canvas
+
+        drawing = self.vector()
+        buffer = io.BytesIO()
+        with stage("render.pdf", ig=self.ig.name):
+            canvas = Canvas(
+                buffer,
+                pagesize=(drawing.width, drawing.height),
+                pageCompression=1,
+                invariant=1,
+            )
+            drawing.form(canvas, "reibergram")
+            canvas.doForm("reibergram")
+            if Qig is not None:
+                self.draw_pdf_overlay(canvas, Qig, Qalbumin)
+            canvas.showPage()
+            canvas.save()
+        return buffer.getvalue()
+
+    def trajectory_png(self, Qig, Qalbumin, order=None):
+        """
+        Return the serial samples of a patient as PNG bytes.
+        """
+        buffer = io.BytesIO()
+        mpimg.imsave(
+            buffer,
+            self.render_trajectory(Qig, Qalbumin, order),
+            format="png",
+            dpi=self.figure.dpi,
+        )
+        return buffer.getvalue()
+
+
+_renderers = {}
+
+
+def get_renderer(ig="IgG", report=False):
+    """
+    Return the process-wide renderer of an immunoglobulin, drawing its static
+    diagram on first use.
+
+    Args:
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        report (bool): Renderer sized to the Word report at REPORT_DPI,
+            instead of the 100 dpi diagram of the original figure.
+    """
+    if (ig, report) not in _renderers:
+        if report:
+            _renderers[ig, report] = ReibergramRenderer(ig, REPORT_DPI, REPORT_SIZE)
+        else:
+            _renderers[ig, report] = ReibergramRenderer(ig)
+    return _renderers[ig, report]
 
 
-def plot_reibergram(Qigg, Qalbumin, barcode="App"):
+def plot_reibergram(Qig, Qalbumin, barcode="App", ig="IgG", format="png"):
     """
     Plot the Reibergram including vertical lines and shaded region.
 
     Args:
-        Qigg (float): QIgG value.
+        Qig (float): QIgG, QIgA or QIgM value.
+        Qalbumin (float): QAlb value.
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        format (str): png, svg or pdf.
+    """
+    with open(f"{barcode}.{format}", "wb") as file:
+        file.write(render_reibergram(Qig, Qalbumin, ig, format))
+
+
+def render_reibergram(Qig, Qalbumin, ig="IgG", format="png"):
+    """
+    Render the Reibergram into memory.
+
+    Args:
+        Qig (float): QIgG, QIgA or QIgM value.
         Qalbumin (float): QAlb value.
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        format (str): png, svg or pdf, or palette for an indexed-color PNG
+            of the size of the Word report diagrams.
+
+    Returns:
+        bytes: Image in the requested format.
     """
-    main_plot_setup(Qigg, Qalbumin)
-    define_lines()
-    draw_vertical_lines()
+    if format == "palette":
+        return get_renderer(ig, report=True).palette_png(Qig, Qalbumin)
+    if format not in ("png", "svg", "pdf"):
+        raise ValueError(f"unsupported format {format!r}")
+    return getattr(get_renderer(ig), format)(Qig, Qalbumin)
+
 
-    plt.savefig(f"{barcode}.png", bbox_inches="tight")
+def render_trajectory(Qig, Qalbumin, ig="IgG", order=None):
+    """
+    Render the serial samples of one patient into memory.
+
+    Args:
+        Qig (array_like): QIgG, QIgA or QIgM values.
+        Qalbumin (array_like): QAlb values.
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        order (array_like): Sampling times or dates, None if Qig and Qalbumin
+            are already in time order.
+
+    Returns:
+        bytes: PNG image.
+    """
+    return get_renderer(ig).trajectory_png(Qig, Qalbumin, order)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,205 @@
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from App import high, low, plot_reibergram
+from Classify import classify, zone_probabilities
+from Quotients import quotients
+from Report import generate_word
+from Thumbnail import render_thumbnail
+
+SIZES = [1, 1_000, 100_000, 1_000_000]
+
+# A result slower than the baseline by more than this fraction is a regression
+TOLERANCE = 0.2
+
+
+def load_development_pdf():
+    """
+    Return generate_pdf of the development data entry window, None when it
+    or PyQt5 is not available.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    folder = os.path.join(here, "In _development")
+    if not os.path.isdir(folder):
+        return None
+    sys.path.insert(0, folder)
+    try:
+        from DataEntry import DataEntryWindow
+    except ImportError as error:
+        print(f"development PDF skipped: {error}")
+        return None
+    finally:
+        sys.path.remove(folder)
+    return DataEntryWindow.generate_pdf
+
+
+def cases(folder):
+    """
+    Yield the name and the function of each benchmark. They run from any
+    folder, Report.STATIC_DIAGRAMS finds IgA.png and IgM.png next to
+    Report.py.
+
+    Args:
+        folder (str): Scratch folder for the written files.
+    """
+    path = os.path.join(folder, "bench")
+    for format in ("png", "svg", "pdf"):
+        yield f"plot_reibergram[{format}]", lambda format=format: plot_reibergram(
+            5e-3, 7e-3, path, format=format
+        )
+
+    for size in (64, 128):
+        yield f"render_thumbnail[{size}]", lambda size=size: render_thumbnail(
+            5e-3, 7e-3, size=size
+        )
+
+    yield "generate_word[IgG]", lambda: generate_word(
+        5e-3, 7e-3, "NAME", 40, "F", "bench", folder
+    )
+    yield "generate_word[IgG,IgA,IgM]", lambda: generate_word(
+        5e-3, 7e-3, "NAME", 40, "F", "bench", folder, 2e-3, 1e-3
+    )
+
+    generate_pdf = load_development_pdf()
+    if generate_pdf is not None:
+        # generate_pdf does not use the window, it is called without one
+        yield "DataEntry.generate_pdf", lambda: generate_pdf(
+            None, 5e-3, 7e-3, "NAME", 40, "F", "bench", folder
+        )
+
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        q_alb = 10 ** rng.uniform(-2.8, -0.9, size)
+        q_igg = 10 ** rng.uniform(-3.5, -0.9, size)
+        yield f"high+low[{size}]", lambda q_alb=q_alb: (high(q_alb), low(q_alb))
+        yield f"classify[{size}]", lambda q_alb=q_alb, q_igg=q_igg: classify(
+            q_alb, q_igg
+        )
+        # CSF albumin in mg/l, serum albumin in g/l with mixed units
+        csf = q_alb * 40e3
+        units = np.where(rng.random(size) < 0.5, "g/l", "g/dl")
+        yield f"quotients[{size}]", lambda csf=csf, units=units: quotients(
+            csf, "mg/l", 40, units
+        )
+
+    # Monte Carlo: samples x draws per sample
+    for samples, draws in ((1, 1_000_000), (1_000, 10_000), (100, 1_000_000)):
+        q_alb = 10 ** rng.uniform(-2.8, -0.9, samples)
+        q_igg = 10 ** rng.uniform(-3.5, -0.9, samples)
+        name = f"zone_probabilities[{samples}x{draws}]"
+        yield name, lambda q_alb=q_alb, q_igg=q_igg, draws=draws: (
+            zone_probabilities(q_alb, q_igg, draws=draws)
+        )
+
+
+def measure(func, repeat):
+    """
+    Time a function and trace its peak memory, as seen by tracemalloc:
+    Python objects and NumPy arrays, not the Agg canvas buffers.
+
+    The first call is timed separately, it includes drawing the diagrams
+    and building the report templates.
+
+    Returns:
+        dict: first, best and median wall time in seconds and peak memory
+        in bytes.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "first": first,
+        "best": min(times),
+        "median": statistics.median(times),
+        "peak": peak,
+    }
+
+
+def compare(results, baseline):
+    """
+    Print the benchmarks whose best time grew beyond TOLERANCE, the best
+    time being the least sensitive to other load on the machine.
+
+    Returns:
+        int: Number of regressions.
+    """
+    regressions = 0
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["best"] / baseline[name]["best"]
+        if ratio > 1 + TOLERANCE:
+            print(f"REGRESSION {name}: {ratio:.2f}x the baseline time")
+            regressions += 1
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure wall time and peak memory of the hot paths."
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=5,
+        help="timed calls per benchmark (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-k", "--filter", help="only run benchmarks whose name contains this text"
+    )
+    parser.add_argument("-o", "--output", help="write the results to a JSON file")
+    parser.add_argument(
+        "-c",
+        "--compare",
+        help="JSON results of an earlier run, exit with 1 on regressions",
+    )
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'benchmark':32} {'first':>10} {'best':>10} {'median':>10} {'peak':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for name, func in cases(folder):
+            if args.filter and args.filter not in name:
+                continue
+            result = measure(func, args.repeat)
+            results[name] = result
+            print(
+                f"{name:32} {result['first'] * 1e3:8.2f}ms "
+                f"{result['best'] * 1e3:8.2f}ms {result['median'] * 1e3:8.2f}ms "
+                f"{result['peak'] / 2**20:8.2f}MB"
+            )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            return 1 if compare(results, json.load(file)) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Job states
+QUEUED = "queued"
+RENDERING = "rendering"
+WRITTEN = "written"
+FAILED = "failed"
+
+JOURNAL_NAME = "jobs.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    barcode TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    arguments TEXT NOT NULL,
+    state TEXT NOT NULL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (barcode, folder)
+)
+"""
+
+
+class Journal:
+    """
+    SQLite journal of report jobs, kept so that an interrupted session or
+    batch can be resumed without redoing the reports already written.
+
+    Every call opens its own connection, so one journal can be shared by the
+    GUI thread and report threads.
+
+    Args:
+        path (str): Journal database, created when missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """
+        Open a connection, commit on success and close it afterwards.
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            connection.execute("PRAGMA synchronous=FULL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def queue(self, barcode, folder, arguments):
+        """
+        Record a report job, or reset the state of an existing one.
+
+        Args:
+            barcode (str): Sample ID, the report is written to <barcode>.docx.
+            folder (str): Folder of the report.
+            arguments (dict): Report fields, see Batch.normalize_row.
+
+        Returns:
+            int: Job ID.
+        """
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs"
+                " (barcode, folder, arguments, state, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (barcode, folder) DO UPDATE SET"
+                " arguments = excluded.arguments, state = excluded.state,"
+                " error = NULL, updated = excluded.updated",
+                (barcode, folder, json.dumps(arguments), QUEUED, now, now),
+            )
+            (job_id,) = connection.execute(
+                "SELECT id FROM jobs WHERE barcode = ? AND folder = ?",
+                (barcode, folder),
+            ).fetchone()
+        return job_id
+
+    def mark(self, job_id, state, error=None):
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET state = ?, error = ?, updated = ? WHERE id = ?",
+                (state, error, time.time(), job_id),
+            )
+
+    def state(self, barcode, folder):
+        """
+        Return the state of a job, None if it was never queued.
+        """
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT state FROM jobs WHERE barcode = ? AND folder = ?",
+                (barcode, folder),
+            ).fetchone()
+        return row[0] if row else None
+
+    def is_written(self, barcode, folder):
+        """
+        Check that a job finished and its report is still on disk.
+        """
+        return self.state(barcode, folder) == WRITTEN and os.path.exists(
+            os.path.join(folder, f"{barcode}.docx")
+        )
+
+    def unfinished(self, include_failed=False):
+        """
+        Return the jobs that were queued but never written.
+
+        Returns:
+            list of tuple: (job ID, folder, arguments) in the order they were
+            queued.
+        """
+        states = [QUEUED, RENDERING]
+        if include_failed:
+            states.append(FAILED)
+        placeholders = ", ".join("?" * len(states))
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT id, folder, arguments FROM jobs"
+                f" WHERE state IN ({placeholders}) ORDER BY id",
+                states,
+            ).fetchall()
+        return [
+            (job_id, folder, json.loads(arguments))
+            for job_id, folder, arguments in rows
+        ]
+
+    def counts(self):
+        with self.connect() as connection:
+            return dict(
+                connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+            )
@@ -1,12 +1,41 @@
-from DataWord import DataEntryWindow
+import threading
+import time
+from Timing import record
 from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QLabel
 from PyQt5.QtCore import Qt, QTimer
-from reportlab.lib.pagesizes import letter
+
+
+def startup_report(stage, launch):
+    """
+    Record the seconds from the start of the application to a start-up stage
+    in the timing file, see Timing.py.
+
+    Args:
+        stage (str): Stage name, "startup.<stage>".
+        launch (float): time.perf_counter() at the start of the application.
+    """
+    record(stage, time.perf_counter() - launch)
+
+
+def warm_up(launch):
+    """
+    Import the heavy modules, start the Reibergram workers and build the
+    report templates while the splash screen is showing, so that the first
+    save is as fast as the later ones.
+    """
+    import DataWord  # noqa: F401 (matplotlib, python-docx)
+    import Report
+
+    startup_report("startup.imports", launch)
+    Report.warm_up()
+    startup_report("startup.warm_up", launch)
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, launch=None):
         super().__init__()
+        # Start of the application, recorded by MainRunner.py before the imports
+        self.launch = time.perf_counter() if launch is None else launch
 
         self.init_ui()
 
@@ -23,6 +52,8 @@ class MainWindow(QMainWindow):
         label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(label)
 
+        threading.Thread(target=warm_up, args=(self.launch,), daemon=True).start()
+
         # Create a timer to close the main window and show the data entry window
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.close_and_show_data_entry)
@@ -31,5 +62,8 @@ class MainWindow(QMainWindow):
     def close_and_show_data_entry(self):
         self.timer.stop()  # Stop the timer
         self.close()  # Close the main window
+        from DataWord import DataEntryWindow
+
         self.data_entry_window = DataEntryWindow()
         self.data_entry_window.show()
+        startup_report("startup.window", self.launch)
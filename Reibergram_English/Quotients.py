@@ -0,0 +1,192 @@
+import re
+
+import numpy as np
+
+from Curves import CONVERSION_FACTOR
+
+# Factors from concentration units to g/l, compared lowercase, with "u" for
+# "µ" and without spaces
+UNITS = {
+    "g/l": 1.0,
+    "g/dl": 10.0,
+    "mg/ml": 1.0,
+    "mg/dl": 1e-2,
+    "mg/l": 1e-3,
+    "ug/ml": 1e-3,
+    "ug/dl": 1e-5,
+    "ug/l": 1e-6,
+    "ng/ml": 1e-6,
+}
+
+# Quotient fields of Batch.normalize_row and the analyte names in headers
+ANALYTES = {
+    "qalb": ["albumin", "albümin", "alb"],
+    "qigg": ["igg"],
+    "qiga": ["iga"],
+    "qigm": ["igm"],
+}
+FLUIDS = {"csf": ["csf", "bos", "liquor"], "serum": ["serum"]}
+
+# "28 mg/l 10 g/l": a CSF and a serum concentration, each with its unit
+PAIR = re.compile(
+    r"^\s*(?P<csf>[\d.,]+)\s*(?P<csf_unit>\S+)"
+    r"\s+(?P<serum>[\d.,]+)\s*(?P<serum_unit>\S+)\s*$"
+)
+
+# "CSF albumin", "CSF albumin (mg/l)" or "CSF albumin units" and the like
+HEADER = re.compile(
+    rf"^(?P<fluid>{'|'.join(sum(FLUIDS.values(), []))})[ _-]*"
+    rf"(?P<analyte>{'|'.join(sum(ANALYTES.values(), []))})"
+    r"(?:\s*[(\[](?P<unit>[^)\]]+)[)\]]|[ _-]*(?P<units>units?|birim))?$"
+)
+
+
+def normalize_unit(unit):
+    return (
+        str(unit).strip().lower().replace(" ", "").replace("µ", "u").replace("μ", "u")
+    )
+
+
+def unit_factors(units):
+    """
+    Return the factors to g/l of an array of unit names, nan if unknown.
+
+    Each distinct unit is looked up once, however many samples there are.
+    """
+    units = np.asarray(units, dtype=str)
+    if units.size and (units == units.flat[0]).all():
+        # One unit for all samples, the usual case
+        return np.full(units.shape, UNITS.get(normalize_unit(units.flat[0]), np.nan))
+    names, inverse = np.unique(units, return_inverse=True)
+    factors = np.array(
+        [UNITS.get(normalize_unit(name), np.nan) for name in names], dtype=float
+    )
+    return factors[inverse].reshape(units.shape)
+
+
+def quotients(csf, csf_units, serum, serum_units):
+    """
+    Compute CSF/serum quotients of concentrations given in any UNITS.
+
+    Args:
+        csf (array_like): CSF concentrations.
+        csf_units (array_like): Units of the CSF concentrations, one for all
+            or one per sample.
+        serum (array_like): Serum concentrations.
+        serum_units (array_like): Units of the serum concentrations.
+
+    Returns:
+        numpy.ndarray: Quotients as fractions, nan where a concentration is
+        missing or not positive or a unit is unknown.
+    """
+    csf, serum = np.broadcast_arrays(
+        np.asarray(csf, dtype=float), np.asarray(serum, dtype=float)
+    )
+    csf_units = np.broadcast_to(np.asarray(csf_units, dtype=str), csf.shape)
+    serum_units = np.broadcast_to(np.asarray(serum_units, dtype=str), serum.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = (csf * unit_factors(csf_units)) / (serum * unit_factors(serum_units))
+    return np.where((csf >= 0) & (serum > 0), q, np.nan)
+
+
+def parse_number(value):
+    try:
+        return float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return np.nan
+
+
+def parse_quotient(text):
+    """
+    Read a quotient typed x 10^-3, or as a CSF and a serum concentration
+    with their units such as "28 mg/l 10 g/l".
+
+    Returns:
+        float: Quotient x 10^-3, like the data entry form.
+
+    Raises:
+        ValueError: If text is neither, or a unit is unknown.
+    """
+    match = PAIR.match(text)
+    if match is None:
+        return float(text.strip().replace(",", "."))
+    q = quotients(
+        parse_number(match["csf"]),
+        match["csf_unit"],
+        parse_number(match["serum"]),
+        match["serum_unit"],
+    )
+    if np.isnan(q):
+        raise ValueError(f"invalid concentrations or units: {text}")
+    return float(q) / CONVERSION_FACTOR
+
+
+def add_quotients(raws):
+    """
+    Fill in the quotients of raw worklist rows that give CSF and serum
+    concentrations instead, computing each quotient for all rows at once.
+
+    A concentration column names the fluid and the analyte, such as
+    "CSF albumin" or "Serum IgG", with its unit in the header, "CSF albumin
+    (mg/l)", or in a column of its own, "CSF albumin unit". Quotients the
+    row already has are kept.
+
+    Args:
+        raws (list of dict): Raw rows, see Batch.normalize_row, updated in
+            place with quotients x 10^-3 like the data entry form.
+
+    Returns:
+        list: An error message per row, None for rows without errors.
+    """
+    columns = {}
+    given = []
+    for index, raw in enumerate(raws):
+        given.append(set())
+        for key, value in raw.items():
+            if value in (None, ""):
+                continue
+            header = str(key).strip().rstrip(":").strip().lower()
+            given[index].add(header)
+            match = HEADER.match(header)
+            if match is None:
+                continue
+            fluid = next(f for f, names in FLUIDS.items() if match["fluid"] in names)
+            field = next(
+                f for f, names in ANALYTES.items() if match["analyte"] in names
+            )
+            cell = columns.setdefault((field, fluid), {}).setdefault(index, {})
+            if match["units"]:
+                cell["unit"] = value
+            else:
+                cell["value"] = value
+                cell.setdefault("unit", match["unit"] or "")
+
+    errors = [None] * len(raws)
+    for field in ANALYTES:
+        csf = columns.get((field, "csf"), {})
+        serum = columns.get((field, "serum"), {})
+        rows = sorted(
+            index
+            for index in set(csf) & set(serum)
+            if "value" in csf[index] and "value" in serum[index]
+        )
+        if not rows:
+            continue
+        q = quotients(
+            [parse_number(csf[index]["value"]) for index in rows],
+            [csf[index]["unit"] for index in rows],
+            [parse_number(serum[index]["value"]) for index in rows],
+            [serum[index]["unit"] for index in rows],
+        )
+        for index, value in zip(rows, q):
+            if field in given[index]:
+                continue
+            if np.isnan(value):
+                errors[index] = errors[index] or (
+                    f"invalid {ANALYTES[field][0]} concentrations or units, "
+                    f"CSF {csf[index]['value']} {csf[index]['unit']}, "
+                    f"serum {serum[index]['value']} {serum[index]['unit']}"
+                )
+                continue
+            raws[index][field] = float(value) / CONVERSION_FACTOR
+    return errors
@@ -0,0 +1,337 @@
+import argparse
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from App import grid_lines, q_alb_values
+from Curves import IMMUNOGLOBULINS, X_MAX, X_MIN, Y_MAX, Y_MIN
+
+# Width of the axes of the 6 inch figure in points, line widths and marker
+# sizes of the full diagram are scaled from it
+AXES_POINTS = 335
+
+# Subpixels per pixel side when drawing the static diagram
+SUPERSAMPLE = 4
+
+# Palette indices: 16 grays from black to white, then the overlay colors
+WHITE = 15
+BLUE = 16
+GREEN = 17
+RED = 18
+PALETTE = bytes(
+    [level for gray in range(16) for level in (gray * 17,) * 3]
+    + [0, 0, 255, 0, 128, 0, 255, 0, 0]
+)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def log_ticks(low, high, major):
+    """
+    Return the major ticks and the minor ticks of a log axis, 2 to 9 times
+    each power of ten, between low and high.
+    """
+    minor = [m * 10.0**k for k in range(-4, 1) for m in range(2, 10)]
+    ticks = np.unique(np.concatenate([major, minor]))
+    return ticks[(ticks >= low) & (ticks <= high)]
+
+
+def static_lines(ig):
+    """
+    Return the polylines of the static diagram, as App draws them.
+
+    Args:
+        ig (Curves.Immunoglobulin): Parameter set of the diagram.
+
+    Returns:
+        list of tuple: QAlb values, QIg values, line width in points and
+        whether the line is dashed.
+    """
+    lines = [
+        (q_alb_values, ig.upper.eval(q_alb_values), 2, False),
+        (q_alb_values, ig.lower.eval(q_alb_values), 1, False),
+    ]
+    for curve in ig.top_limit:
+        lines.append((q_alb_values, curve.eval(q_alb_values), 1, True))
+
+    x_ticks = log_ticks(X_MIN, X_MAX, [*ig.x_ticks, 15e-3, 1.5e-3])
+    y_ticks = log_ticks(Y_MIN, Y_MAX, [*ig.y_ticks, 15e-3, 1.5e-3])
+    vertical, horizontal = grid_lines(ig, x_ticks, y_ticks)
+    for x, y1, y2 in zip(*vertical):
+        lines.append(([x, x], [y1, y2], 0.5, False))
+    for y, x1, x2 in zip(*horizontal):
+        lines.append(([x1, x2], [y, y], 0.5, False))
+
+    for x, y1, y2 in zip(ig.vertical_lines_x, ig.vertical_ymin, ig.vertical_ymax):
+        lines.append(([x, x], [y1, y2], 2, False))
+    return lines
+
+
+def encode_png(image, palette=PALETTE, level=6):
+    """
+    Encode an image of palette indices as an indexed-color PNG.
+
+    Args:
+        image (numpy.ndarray): uint8 palette indices, one row per image row.
+        palette (bytes): RGB triplets of the palette.
+        level (int): zlib compression level.
+
+    Returns:
+        bytes: PNG file.
+    """
+    height, width = image.shape
+    raw = np.zeros((height, width + 1), np.uint8)  # filter type 0 per row
+    raw[:, 1:] = image
+
+    def chunk(kind, data):
+        crc = zlib.crc32(data, zlib.crc32(kind))
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+            chunk(b"PLTE", palette),
+            chunk(b"IDAT", zlib.compress(raw.tobytes(), level)),
+            chunk(b"IEND", b""),
+        ]
+    )
+
+
+class ThumbnailRenderer:
+    """
+    Rasterize small Reibergrams with NumPy, without matplotlib.
+
+    The static diagram is drawn once, antialiased by supersampling, into an
+    image of palette indices. Each thumbnail copies it, draws the guide
+    lines and the patient point, and is encoded straight to PNG. Only the
+    plot area is drawn, without tick labels or text.
+
+    Args:
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        size (int): Width and height of the thumbnails in pixels.
+    """
+
+    def __init__(self, ig="IgG", size=128):
+        self.ig = IMMUNOGLOBULINS[ig]
+        self.size = size
+        # Pixels per point of the full diagram
+        self.scale = size / AXES_POINTS
+
+        high = size * SUPERSAMPLE
+        coverage = np.zeros((high, high), bool)
+        for x, y, width, dashed in static_lines(self.ig):
+            self.stroke(coverage, x, y, width, dashed, SUPERSAMPLE)
+        self.stroke_frame(coverage, SUPERSAMPLE)
+        coverage = coverage.reshape(size, SUPERSAMPLE, size, SUPERSAMPLE).mean((1, 3))
+        self.background = np.round((1 - coverage) * WHITE).astype(np.uint8)
+
+        radius = max(3 * self.scale, 1.5)
+        offsets = np.arange(-int(radius), int(radius) + 1)
+        dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+        inside = dx**2 + dy**2 <= radius**2
+        self.disk = dy[inside], dx[inside]
+
+    def pixel(self, Qig, Qalbumin, supersample=1):
+        """
+        Return the column and row of data points, from the top left corner.
+        """
+        size = self.size * supersample
+        column = (np.log10(Qalbumin) - np.log10(X_MIN)) / np.log10(X_MAX / X_MIN)
+        row = (np.log10(Y_MAX) - np.log10(Qig)) / np.log10(Y_MAX / Y_MIN)
+        return column * size, row * size
+
+    def stroke(self, coverage, x, y, width, dashed, supersample):
+        """
+        Mark the subpixels covered by a polyline of width points.
+        """
+        columns, rows = self.pixel(
+            np.asarray(y, float), np.asarray(x, float), supersample
+        )
+        # Points along each segment, at most half a subpixel apart
+        lengths = np.hypot(np.diff(columns), np.diff(rows))
+        steps = np.maximum(np.ceil(lengths * 2).astype(int), 1)
+        segment = np.repeat(np.arange(len(lengths)), steps)
+        starts = np.repeat(np.cumsum(steps) - steps, steps)
+        t = (np.arange(steps.sum()) - starts) / steps[segment]
+        columns = columns[segment] + np.diff(columns)[segment] * t
+        rows = rows[segment] + np.diff(rows)[segment] * t
+
+        pixels = width * self.scale * supersample
+        if dashed:
+            # The 3.7 on, 1.6 off pattern of matplotlib, in line widths
+            distance = np.concatenate(
+                [[0], np.cumsum(np.hypot(*np.diff([columns, rows])))]
+            )
+            keep = distance % (5.3 * pixels) < 3.7 * pixels
+            columns, rows = columns[keep], rows[keep]
+
+        half = max(pixels / 2, 0.5)
+        offsets = np.arange(-half + 0.5, half)
+        for dy in offsets:
+            for dx in offsets:
+                self.mark(coverage, rows + dy, columns + dx)
+
+    def stroke_frame(self, coverage, supersample):
+        """
+        Mark the axes frame and the inward ticks of the bottom and left axes.
+        """
+        high = self.size * supersample
+        pixels = max(int(round(self.scale * supersample)), 1)
+        coverage[:pixels] = coverage[-pixels:] = True
+        coverage[:, :pixels] = coverage[:, -pixels:] = True
+
+        length = int(round(8 * self.scale * supersample))
+        tick = max(int(round(1.5 * self.scale * supersample)), 1)
+        x_ticks = log_ticks(X_MIN, X_MAX, [*self.ig.x_ticks, 15e-3, 1.5e-3])
+        y_ticks = log_ticks(Y_MIN, Y_MAX, [*self.ig.y_ticks, 15e-3, 1.5e-3])
+        columns, _ = self.pixel(Y_MAX, x_ticks, supersample)
+        _, rows = self.pixel(y_ticks, X_MAX, supersample)
+        for column in columns.astype(int):
+            coverage[high - length :, column : column + tick] = True
+        for row in rows.astype(int):
+            coverage[row : row + tick, :length] = True
+
+    @staticmethod
+    def mark(image, rows, columns, value=True):
+        rows = np.round(rows).astype(int)
+        columns = np.round(columns).astype(int)
+        inside = (
+            (rows >= 0)
+            & (rows < image.shape[0])
+            & (columns >= 0)
+            & (columns < image.shape[1])
+        )
+        image[rows[inside], columns[inside]] = value
+
+    def render(self, Qig=None, Qalbumin=None):
+        """
+        Return the thumbnail as palette indices.
+        """
+        image = self.background.copy()
+        if Qig is None or Qalbumin is None:
+            return image
+
+        # Non-positive quotients lie left of or below the log axes, like the
+        # points beyond the axes they are clipped away
+        limit = 2 * self.size
+        column = self.pixel(Y_MAX, Qalbumin)[0] if Qalbumin > 0 else -limit
+        row = self.pixel(Qig, X_MAX)[1] if Qig > 0 else limit
+        column = int(round(np.clip(column, -limit, limit)))
+        row = int(round(np.clip(row, -limit, limit)))
+        if 0 <= column < self.size:
+            image[max(row, 0) :, column] = BLUE
+        if 0 <= row < self.size:
+            image[row, : max(column, 0)] = GREEN
+        self.mark(image, row + self.disk[0], column + self.disk[1], RED)
+        return image
+
+    def png(self, Qig=None, Qalbumin=None):
+        return encode_png(self.render(Qig, Qalbumin))
+
+
+_thumbnailers = {}
+
+
+def get_thumbnailer(ig="IgG", size=128):
+    """
+    Return the process-wide thumbnail renderer of an immunoglobulin and size.
+    """
+    if (ig, size) not in _thumbnailers:
+        _thumbnailers[ig, size] = ThumbnailRenderer(ig, size)
+    return _thumbnailers[ig, size]
+
+
+def render_thumbnail(Qig, Qalbumin, ig="IgG", size=128):
+    """
+    Render a Reibergram thumbnail.
+
+    Args:
+        Qig (float): QIgG, QIgA or QIgM value.
+        Qalbumin (float): QAlb value.
+        ig (str): Immunoglobulin of the diagram, see Curves.IMMUNOGLOBULINS.
+        size (int): Width and height in pixels.
+
+    Returns:
+        bytes: Indexed-color PNG.
+    """
+    return get_thumbnailer(ig, size).png(Qig, Qalbumin)
+
+
+def contact_sheet(images, columns=10, gap=4):
+    """
+    Tile thumbnails of palette indices into one image, row by row.
+
+    Args:
+        images (list of numpy.ndarray): Thumbnails of the same size.
+        columns (int): Thumbnails per row.
+        gap (int): White pixels between the thumbnails.
+
+    Returns:
+        numpy.ndarray: Palette indices of the sheet.
+    """
+    height, width = images[0].shape
+    rows = -(-len(images) // columns)
+    sheet = np.full(
+        (rows * (height + gap) - gap, columns * (width + gap) - gap), WHITE, np.uint8
+    )
+    for i, image in enumerate(images):
+        top = i // columns * (height + gap)
+        left = i % columns * (width + gap)
+        sheet[top : top + height, left : left + width] = image
+    return sheet
+
+
+def main(argv=None):
+    from Batch import read_worklist
+
+    parser = argparse.ArgumentParser(
+        description="Render IgG Reibergram thumbnails for a CSV or Excel worklist."
+    )
+    parser.add_argument("worklist", help="worklist, see Batch.py")
+    parser.add_argument(
+        "-o", "--output", default=".", help="folder of the thumbnails (default: .)"
+    )
+    parser.add_argument(
+        "-s",
+        "--size",
+        type=int,
+        default=128,
+        help="thumbnail size in pixels (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--sheet",
+        help="write a single contact sheet PNG instead of one file per sample",
+    )
+    parser.add_argument(
+        "-c",
+        "--columns",
+        type=int,
+        default=10,
+        help="thumbnails per row of the contact sheet (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    rows = read_worklist(args.worklist)
+    thumbnailer = get_thumbnailer("IgG", args.size)
+    start = time.perf_counter()
+    if args.sheet:
+        images = [thumbnailer.render(row["qigg"], row["qalb"]) for row in rows]
+        with open(args.sheet, "wb") as file:
+            file.write(encode_png(contact_sheet(images, args.columns)))
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        for row in rows:
+            path = os.path.join(args.output, f"{row['barcode']}.png")
+            with open(path, "wb") as file:
+                file.write(thumbnailer.png(row["qigg"], row["qalb"]))
+    elapsed = time.perf_counter() - start
+    print(f"{len(rows)} thumbnails rendered in {elapsed:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
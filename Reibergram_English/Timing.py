@@ -0,0 +1,161 @@
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# Timing is off unless this variable names a JSON lines file to append to,
+# it is inherited by the render processes
+TIMING_ENV = "REIBERGRAM_TIMING"
+
+_fd = None
+_path = None
+# Descriptors of every file enabled, never closed: a stage of another thread
+# may still write to a descriptor when timing moves to another file
+_fds = {}
+_lock = threading.Lock()
+_null = contextlib.nullcontext()
+
+
+def enable(path):
+    """
+    Append the timing records of this process to a JSON lines file, None
+    turns timing off.
+    """
+    global _fd, _path
+    with _lock:
+        _path = path
+        if path:
+            os.environ[TIMING_ENV] = path
+            if path not in _fds:
+                flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+                _fds[path] = os.open(path, flags, 0o644)
+            _fd = _fds[path]
+        else:
+            os.environ.pop(TIMING_ENV, None)
+            _fd = None
+
+
+class Stage:
+    def __init__(self, name, fields, fd):
+        self.name = name
+        self.fields = fields
+        self.fd = fd
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fields = dict(self.fields)
+        if exc_type is not None:
+            fields["error"] = exc_type.__name__
+        write(self.fd, self.name, time.perf_counter() - self.start, fields)
+        return False
+
+
+def write(fd, name, seconds, fields):
+    record = {
+        "stage": name,
+        "seconds": seconds,
+        "time": time.time(),
+        "pid": os.getpid(),
+        "thread": threading.get_ident(),
+        **fields,
+    }
+    # One write per record, appends of whole lines do not interleave
+    os.write(fd, (json.dumps(record) + "\n").encode())
+
+
+def current_fd():
+    if os.environ.get(TIMING_ENV) != _path:
+        enable(os.environ.get(TIMING_ENV))
+    return _fd
+
+
+def stage(name, **fields):
+    """
+    Time a stage of the report pipeline.
+
+    Usage:
+        with stage("report.save", barcode=barcode):
+            ...
+
+    Args:
+        name (str): Stage name, "<pipeline>.<stage>".
+        **fields: Extra JSON fields of the record, such as the sample ID.
+
+    Returns:
+        Context manager writing one record on exit, or doing nothing when
+        timing is off.
+    """
+    fd = current_fd()
+    if fd is None:
+        return _null
+    return Stage(name, fields, fd)
+
+
+def record(name, seconds, **fields):
+    """
+    Record a duration measured elsewhere, such as the time since start-up,
+    like a stage of that many seconds. Does nothing when timing is off.
+    """
+    fd = current_fd()
+    if fd is not None:
+        write(fd, name, seconds, fields)
+
+
+def summarize(paths):
+    """
+    Aggregate timing records per stage.
+
+    Args:
+        paths (list of str): JSON lines files written by stage.
+
+    Returns:
+        dict: Stage name to count, total, p50, p95 and p99 in seconds.
+    """
+    seconds = defaultdict(list)
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    seconds[record["stage"]].append(record["seconds"])
+
+    summary = {}
+    for name, values in sorted(seconds.items()):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary[name] = {
+            "count": len(values),
+            "total": float(np.sum(values)),
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=f"Summarize the timing records written with {TIMING_ENV} set."
+    )
+    parser.add_argument("records", nargs="+", help="JSON lines timing files")
+    args = parser.parse_args(argv)
+
+    print(f"{'stage':24} {'count':>7} {'total':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in summarize(args.records).items():
+        print(
+            f"{name:24} {row['count']:7d} {row['total']:8.2f}s "
+            f"{row['p50'] * 1e3:7.2f}ms {row['p95'] * 1e3:7.2f}ms "
+            f"{row['p99'] * 1e3:7.2f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,269 @@
+import math
+import os
+
+import numpy as np
+from matplotlib.backend_bases import RendererBase
+from matplotlib.font_manager import findfont
+from matplotlib.mathtext import MathTextParser
+from matplotlib.path import Path
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import FILL_NON_ZERO
+
+# PDF line caps and joins of the matplotlib styles
+CAPS = {"butt": 0, "round": 1, "projecting": 2}
+JOINS = {"miter": 0, "round": 1, "bevel": 2}
+
+
+def register_font(path):
+    """
+    Register a TrueType font file with reportlab once and return its name.
+    Only the glyphs a document uses are embedded.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(name, path))
+    return name
+
+
+class Recorder(RendererBase):
+    """
+    Matplotlib renderer that keeps the paths and text of a figure as drawing
+    commands in points, instead of rasterizing or writing them.
+
+    Text keeps its TrueType font and is not turned into outlines. Mathtext
+    is laid out by matplotlib and recorded glyph by glyph.
+
+    Args:
+        figure (matplotlib.figure.Figure): Figure to be drawn with it.
+    """
+
+    def __init__(self, figure):
+        super().__init__()
+        self.dpi = figure.dpi
+        self.width, self.height = figure.bbox.width, figure.bbox.height
+        self.scale = 72 / self.dpi
+        self.commands = []
+        self.mathtext_parser = MathTextParser("path")
+
+    def points_to_pixels(self, points):
+        return points * self.dpi / 72
+
+    def get_canvas_width_height(self):
+        return self.width, self.height
+
+    def flipy(self):
+        return False
+
+    def option_image_nocomposite(self):
+        return True
+
+    def clip(self, gc):
+        rectangle = gc.get_clip_rectangle()
+        if rectangle is None:
+            return None
+        return tuple(np.multiply(rectangle.bounds, self.scale))
+
+    def draw_path(self, gc, path, transform, rgbFace=None):
+        segments = [
+            (code, tuple(vertices * self.scale))
+            for vertices, code in path.iter_segments(
+                transform, remove_nans=True, simplify=path.should_simplify
+            )
+        ]
+        if not segments:
+            return
+        stroke = gc.get_rgb() if gc.get_linewidth() > 0 else None
+        if stroke is not None and stroke[3] == 0:
+            stroke = None
+        fill = None
+        if rgbFace is not None:
+            alpha = rgbFace[3] if len(rgbFace) == 4 else 1.0
+            if gc.get_forced_alpha() or len(rgbFace) == 3:
+                alpha = gc.get_alpha()
+            fill = (*rgbFace[:3], alpha) if alpha > 0 else None
+        if stroke is None and fill is None:
+            return
+        offset, dashes = gc.get_dashes()
+        self.commands.append(
+            (
+                "path",
+                self.clip(gc),
+                segments,
+                stroke,
+                fill,
+                gc.get_linewidth(),
+                (list(dashes or []), offset or 0),
+                CAPS.get(gc.get_capstyle(), 0),
+                JOINS.get(gc.get_joinstyle(), 0),
+            )
+        )
+
+    def draw_text(self, gc, x, y, s, prop, angle, ismath=False, mtext=None):
+        if ismath == "TeX":
+            return self._draw_text_as_path(gc, x, y, s, prop, angle, ismath)
+        if not ismath:
+            glyphs = [(str(findfont(prop)), prop.get_size_in_points(), s, 0, 0)]
+            rects = []
+        else:
+            parse = self.mathtext_parser.parse(s, 72, prop)
+            # (font, size, code, [glyph index,] x, y) depending on matplotlib
+            glyphs = [
+                (font.fname, size, chr(code), ox, oy)
+                for font, size, code, *_, ox, oy in parse.glyphs
+            ]
+            rects = parse.rects
+        # Other font formats are drawn as outlines
+        if not all(path.lower().endswith(".ttf") for path, *_ in glyphs):
+            return self._draw_text_as_path(gc, x, y, s, prop, angle, ismath)
+
+        x, y = x * self.scale, y * self.scale
+        cos, sin = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+        clip = self.clip(gc)
+        for path, size, text, ox, oy in glyphs:
+            position = (x + ox * cos - oy * sin, y + ox * sin + oy * cos)
+            self.commands.append(
+                ("text", clip, path, size, text, position, angle, gc.get_rgb())
+            )
+        for ox, oy, width, height in rects:
+            corners = np.array([[0, 0], [width, 0], [width, height], [0, height]])
+            corners = corners + (ox, oy)
+            corners = corners @ np.array([[cos, sin], [-sin, cos]]) + (x, y)
+            segments = [(Path.MOVETO, tuple(corners[0]))]
+            segments += [(Path.LINETO, tuple(corner)) for corner in corners[1:]]
+            segments.append((Path.CLOSEPOLY, ()))
+            self.commands.append(
+                ("path", clip, segments, None, gc.get_rgb(), 0, ([], 0), 0, 0)
+            )
+
+
+class Drawing:
+    """
+    Static part of a diagram as vector drawing commands, replayed into
+    reportlab canvases.
+
+    Args:
+        commands (list): Commands of a Recorder, in points.
+        box (tuple): x, y, width and height of the part of the figure that
+            is drawn, in points.
+        scale (float): Points per pixel of the figure.
+    """
+
+    def __init__(self, commands, box, scale):
+        self.commands = commands
+        self.x0, self.y0, self.width, self.height = box
+        self.scale = scale
+
+    def locate(self, points):
+        """
+        Convert figure pixels to points from the bottom left of the drawing.
+
+        Args:
+            points (array_like): x and y pixels, one row per point.
+
+        Returns:
+            numpy.ndarray: x and y points, one row per point.
+        """
+        return np.asarray(points, dtype=float) * self.scale - (self.x0, self.y0)
+
+    def draw(self, canvas):
+        """
+        Replay the commands, the bottom left corner of the drawing at the
+        origin of canvas.
+        """
+        canvas.saveState()
+        canvas.translate(-self.x0, -self.y0)
+        clip = False
+        for kind, command_clip, *command in self.commands:
+            if command_clip != clip:
+                # Clipping can only be undone by restoring the state
+                if clip is not False:
+                    canvas.restoreState()
+                canvas.saveState()
+                if command_clip is not None:
+                    path = canvas.beginPath()
+                    path.rect(*command_clip)
+                    canvas.clipPath(path, stroke=0, fill=0)
+                clip = command_clip
+            if kind == "path":
+                self.draw_path(canvas, *command)
+            else:
+                self.draw_text(canvas, *command)
+        if clip is not False:
+            canvas.restoreState()
+        canvas.restoreState()
+
+    @staticmethod
+    def draw_path(canvas, segments, stroke, fill, width, dashes, cap, join):
+        path = canvas.beginPath()
+        current = (0, 0)
+        for code, coords in segments:
+            if code == Path.MOVETO:
+                path.moveTo(*coords)
+            elif code == Path.LINETO:
+                path.lineTo(*coords)
+            elif code == Path.CURVE3:
+                # Quadratic Bezier as the equivalent cubic one
+                (x0, y0), (x1, y1), (x2, y2) = current, coords[:2], coords[2:]
+                path.curveTo(
+                    x0 + 2 / 3 * (x1 - x0),
+                    y0 + 2 / 3 * (y1 - y0),
+                    x2 + 2 / 3 * (x1 - x2),
+                    y2 + 2 / 3 * (y1 - y2),
+                    x2,
+                    y2,
+                )
+            elif code == Path.CURVE4:
+                path.curveTo(*coords)
+            elif code == Path.CLOSEPOLY:
+                path.close()
+            if coords:
+                current = coords[-2:]
+        if stroke is not None:
+            canvas.setStrokeColorRGB(*stroke)
+            canvas.setLineWidth(width)
+            canvas.setDash(*dashes)
+            canvas.setLineCap(cap)
+            canvas.setLineJoin(join)
+        if fill is not None:
+            canvas.setFillColorRGB(*fill)
+        canvas.drawPath(
+            path,
+            stroke=int(stroke is not None),
+            fill=int(fill is not None),
+            fillMode=FILL_NON_ZERO,
+        )
+
+    @staticmethod
+    def draw_text(canvas, path, size, text, position, angle, color):
+        canvas.saveState()
+        canvas.translate(*position)
+        canvas.rotate(angle)
+        canvas.setFont(register_font(path), size)
+        canvas.setFillColorRGB(*color)
+        canvas.drawString(0, 0, text)
+        canvas.restoreState()
+
+    def form(self, canvas, name):
+        """
+        Write the drawing once into a document as a form XObject, which
+        canvas.doForm(name) then places at the origin of each page.
+        """
+        canvas.beginForm(name, 0, 0, self.width, self.height)
+        self.draw(canvas)
+        canvas.endForm()
+
+
+def record(figure, bbox_inches):
+    """
+    Record the visible artists of a figure as a Drawing.
+
+    Args:
+        figure (matplotlib.figure.Figure): Figure, drawn once.
+        bbox_inches (matplotlib.transforms.Bbox): Part of the figure kept,
+            in inches, such as the tight bounding box.
+    """
+    recorder = Recorder(figure)
+    figure.draw(recorder)
+    box = tuple(np.multiply(bbox_inches.bounds, 72))
+    return Drawing(recorder.commands, box, recorder.scale)
@@ -0,0 +1,293 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from App import CONVERSION_FACTOR, get_renderer
+from Journal import FAILED, JOURNAL_NAME, RENDERING, WRITTEN, Journal
+from Quotients import add_quotients
+from Report import (
+    DOCUMENTS_FOLDER,
+    create_date_folder,
+    generate_combined_word,
+    generate_pdf,
+    generate_word,
+)
+from Store import STORE_NAME, Store
+
+# Worklist headers, compared lowercase and without a trailing ":"
+COLUMNS = {
+    "name": ["name", "name surname", "adı soyadı"],
+    "age": ["age", "yaş", "yaşı"],
+    "sex": ["sex", "cinsiyet", "cinsiyeti"],
+    "barcode": ["sample id", "barcode", "örnek no", "örnek numarası"],
+    "qigg": ["qigg"],
+    "qalb": ["qalb"],
+}
+OPTIONAL_COLUMNS = {
+    "qiga": ["qiga"],
+    "qigm": ["qigm"],
+}
+SEXES = ["K", "E", "M", "F"]
+
+
+def read_rows(path):
+    """
+    Read the raw worklist rows from a CSV or Excel file.
+
+    Returns:
+        list of dict: One dictionary per row, keyed by the header cells.
+    """
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        values = workbook.active.iter_rows(values_only=True)
+        header = [str(cell) for cell in next(values)]
+        rows = [dict(zip(header, row)) for row in values]
+        workbook.close()
+        return rows
+
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        sample = file.read(4096)
+        file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        return list(csv.DictReader(file, dialect=dialect))
+
+
+def normalize_row(raw):
+    """
+    Map a raw worklist row onto the report fields and validate it like the
+    data entry form does.
+
+    Returns:
+        dict: name, age, sex, barcode, qigg, qalb, qiga and qigm, quotients
+        as fractions and None for a missing QIgA or QIgM.
+
+    Raises:
+        ValueError: If a field is missing or not valid.
+    """
+    by_header = {
+        str(key).strip().rstrip(":").strip().lower(): value
+        for key, value in raw.items()
+        if key is not None
+    }
+    row = {}
+    for field, headers in {**COLUMNS, **OPTIONAL_COLUMNS}.items():
+        value = next(
+            (by_header[h] for h in headers if by_header.get(h) not in (None, "")),
+            None,
+        )
+        if value is None and field in COLUMNS:
+            raise ValueError(f"missing {field}")
+        row[field] = None if value is None else str(value).strip()
+
+    if row["sex"].upper() not in SEXES:
+        raise ValueError(f"invalid sex {row['sex']!r}")
+
+    row["name"] = row["name"].upper()
+    row["sex"] = row["sex"].upper()
+    row["age"] = int(float(row["age"]))
+    row["qigg"] = float(row["qigg"].replace(",", ".")) * CONVERSION_FACTOR
+    row["qalb"] = float(row["qalb"].replace(",", ".")) * CONVERSION_FACTOR
+    for field in OPTIONAL_COLUMNS:
+        if row[field] is not None:
+            row[field] = float(row[field].replace(",", ".")) * CONVERSION_FACTOR
+    return row
+
+
+def read_worklist(path):
+    """
+    Read and validate a worklist, reporting and skipping invalid rows.
+
+    Rows may give CSF and serum concentrations instead of the quotients,
+    see Quotients.add_quotients.
+    """
+    rows = []
+    raws = read_rows(path)
+    errors = add_quotients(raws)
+    for line, (raw, error) in enumerate(zip(raws, errors), start=2):
+        try:
+            if error:
+                raise ValueError(error)
+            rows.append(normalize_row(raw))
+        except ValueError as error:
+            print(f"{path}:{line}: skipped, {error}")
+    return rows
+
+
+def unique_samples(rows):
+    """
+    Drop the rows of sample IDs repeated in the worklist, keeping the first.
+
+    Reports already written to the same folder are found in the journal.
+    Reports of other folders, such as the day before or a ward-round PDF,
+    do not stop a sample from being written again.
+
+    Args:
+        rows (list of dict): Rows of read_worklist.
+
+    Returns:
+        list of dict: The rows kept, in worklist order.
+    """
+    kept = []
+    barcodes = set()
+    for row in rows:
+        barcode = row["barcode"]
+        if barcode in barcodes:
+            print(f"{barcode}: skipped, duplicate sample ID in the worklist")
+            continue
+        barcodes.add(barcode)
+        kept.append(row)
+    return kept
+
+
+def render_report(row, folder_path):
+    return generate_word(
+        row["qigg"],
+        row["qalb"],
+        row["name"],
+        row["age"],
+        row["sex"],
+        row["barcode"],
+        folder_path,
+        row["qiga"],
+        row["qigm"],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render Reibergram Word reports for a CSV or Excel worklist."
+    )
+    parser.add_argument(
+        "worklist",
+        nargs="?",
+        help="worklist with name, age, sex, sample ID, QIgG and QAlb columns "
+        "and optional QIgA and QIgM columns, or CSF and serum concentration "
+        "columns with units such as 'CSF albumin (mg/l)'",
+    )
+    parser.add_argument(
+        "-o", "--output", help="folder for the reports (default: today's folder)"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--journal",
+        default=os.path.join(DOCUMENTS_FOLDER, JOURNAL_NAME),
+        help="job journal, shared by the runs of every day so that --resume "
+        "finds earlier jobs; reports it records as written are not generated "
+        "again (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="also retry the unfinished and failed jobs of the journal",
+    )
+    parser.add_argument(
+        "--redo",
+        action="store_true",
+        help="generate every report of the worklist, even if the journal "
+        "records it as written",
+    )
+    parser.add_argument(
+        "-s",
+        "--store",
+        default=os.path.join(DOCUMENTS_FOLDER, STORE_NAME),
+        help="sample store the written Word reports are recorded in "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--pdf",
+        help="write the IgG reports of the worklist into this multi-page PDF "
+        "instead of Word documents",
+    )
+    parser.add_argument(
+        "--docx",
+        help="write the reports of the worklist into this Word document, one "
+        "page per patient, instead of one document per sample",
+    )
+    args = parser.parse_args(argv)
+    if args.worklist is None and not args.resume:
+        parser.error("a worklist is required unless --resume is given")
+    if (args.pdf or args.docx) and args.worklist is None:
+        parser.error("--pdf and --docx need a worklist")
+
+    if args.pdf or args.docx:
+        # The combined file is not a report of its own for any sample, it
+        # is not recorded in the store
+        rows = unique_samples(read_worklist(args.worklist))
+        start = time.perf_counter()
+        if args.pdf:
+            path = generate_pdf(rows, args.pdf)
+        else:
+            path = generate_combined_word(rows, args.docx, concurrent=True)
+        elapsed = time.perf_counter() - start
+        print(f"{len(rows)} reports written to {path} in {elapsed:.1f} s")
+        return 0
+
+    rows = read_worklist(args.worklist) if args.worklist else []
+    if args.output:
+        folder_path = args.output
+        os.makedirs(folder_path, exist_ok=True)
+    else:
+        folder_path = create_date_folder()
+
+    journal = Journal(args.journal)
+    store = Store(args.store)
+    jobs = {}
+    skipped = 0
+    for row in unique_samples(rows):
+        if not args.redo and journal.is_written(row["barcode"], folder_path):
+            skipped += 1
+            continue
+        job_id = journal.queue(row["barcode"], folder_path, row)
+        jobs[job_id] = (row, folder_path)
+    if args.resume:
+        for job_id, folder, row in journal.unfinished(include_failed=True):
+            jobs.setdefault(job_id, (row, folder))
+    if skipped:
+        print(f"{skipped} reports already written, skipped")
+
+    start = time.perf_counter()
+    written = 0
+    failed = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers, initializer=get_renderer, initargs=("IgG", True)
+    ) as executor:
+        futures = {}
+        for job_id, (row, folder) in jobs.items():
+            journal.mark(job_id, RENDERING)
+            futures[executor.submit(render_report, row, folder)] = job_id
+        for future in as_completed(futures):
+            job_id = futures[future]
+            try:
+                doc_path = future.result()
+                journal.mark(job_id, WRITTEN)
+                store.record(jobs[job_id][0], doc_path)
+                written += 1
+            except Exception as error:
+                journal.mark(job_id, FAILED, str(error))
+                print(f"{jobs[job_id][0]['barcode']}: failed, {error}")
+                failed += 1
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{written} reports written to {folder_path} in {elapsed:.1f} s "
+        f"({written / elapsed if elapsed else 0:.1f} reports/s), {failed} failed"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,189 @@
+from collections import namedtuple
+
+import numpy as np
+
+from Curves import IMMUNOGLOBULINS
+
+# Reibergram zones
+# Reiber, H. (1994). Flow rate of cerebrospinal fluid (CSF) —
+# A concept common to normal blood-CSF barrier function and to dysfunction in neurological diseases.
+# Journal of the Neurological Sciences, 122(2), 189–203. doi:10.1016/0022-510x(94)90298-4
+UNKNOWN = 0
+NORMAL = 1
+BARRIER_DYSFUNCTION = 2
+COMBINED = 3
+INTRATHECAL_SYNTHESIS = 4
+BELOW_LOWER_LIMIT = 5
+
+ZONE_NAMES = {
+    UNKNOWN: "unknown",
+    NORMAL: "normal",
+    BARRIER_DYSFUNCTION: "barrier dysfunction",
+    COMBINED: "barrier dysfunction and intrathecal synthesis",
+    INTRATHECAL_SYNTHESIS: "intrathecal synthesis",
+    BELOW_LOWER_LIMIT: "below lower limit",
+}
+
+# Rightmost vertical line of the diagram, the QAlb reference at 60 years
+QALB_LIMIT = 8e-3
+
+Classification = namedtuple(
+    "Classification", ["zone", "q_lim_upper", "q_lim_lower", "igif"]
+)
+
+# Coefficients of variation of the quotients in zone_probabilities, each
+# combining the analytical CVs of the CSF and the serum measurement
+CV_ALB = 0.05
+CV_IG = 0.05
+
+# Monte Carlo draws per sample, and draws evaluated at once, few enough for
+# the working arrays to stay in the CPU cache
+DRAWS = 100_000
+CHUNK = 2**16
+
+Probabilities = namedtuple("Probabilities", ["synthesis", "barrier"])
+
+
+def q_alb_limit(age):
+    """
+    Age-dependent upper reference of QAlb, (4 + age / 15) x 10^-3.
+
+    Args:
+        age (array_like): Patient ages in years.
+
+    Returns:
+        numpy.ndarray: QAlb reference values.
+    """
+    return (4 + np.asarray(age, dtype=float) / 15) * 1e-3
+
+
+def classify(q_alb, q_ig, q_alb_max=QALB_LIMIT, ig="IgG"):
+    """
+    Classify samples into Reibergram zones in one vectorized pass.
+
+    Args:
+        q_alb (array_like): QAlb values.
+        q_ig (array_like): QIg values, same shape as q_alb.
+        q_alb_max (float or array_like): QAlb reference above which the
+            blood-CSF barrier is dysfunctional, see q_alb_limit.
+        ig (str): Immunoglobulin of q_ig, see Curves.IMMUNOGLOBULINS.
+
+    Returns:
+        Classification: Zone codes (numpy.int8), Qlim(upper), Qlim(lower)
+        and the intrathecal fraction IgIF in percent (0 below Qlim(upper)).
+    """
+    q_alb, q_ig = np.broadcast_arrays(
+        np.asarray(q_alb, dtype=float), np.asarray(q_ig, dtype=float)
+    )
+
+    upper, lower = IMMUNOGLOBULINS[ig].upper, IMMUNOGLOBULINS[ig].lower
+    q_lim_upper = upper.eval(q_alb)
+    q_lim_lower = lower.eval(q_alb)
+
+    synthesis = q_ig > q_lim_upper
+    barrier = q_alb > q_alb_max
+
+    zone = np.full(q_alb.shape, NORMAL, dtype=np.int8)
+    zone[barrier] = BARRIER_DYSFUNCTION
+    zone[synthesis] = INTRATHECAL_SYNTHESIS
+    zone[synthesis & barrier] = COMBINED
+    zone[q_ig < q_lim_lower] = BELOW_LOWER_LIMIT
+    zone[~(np.isfinite(q_alb) & np.isfinite(q_ig))] = UNKNOWN
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        igif = np.where(synthesis, (1 - q_lim_upper / q_ig) * 100, 0.0)
+
+    return Classification(zone, q_lim_upper, q_lim_lower, igif)
+
+
+def zone_probabilities(
+    q_alb,
+    q_ig,
+    q_alb_max=QALB_LIMIT,
+    ig="IgG",
+    cv_alb=CV_ALB,
+    cv_ig=CV_IG,
+    draws=DRAWS,
+    seed=0,
+):
+    """
+    Estimate by Monte Carlo how likely samples are to show intrathecal
+    synthesis and barrier dysfunction, given the uncertainty of the quotients.
+
+    Each draw multiplies QAlb and QIg by log-normal noise with a median of 1,
+    so a sample on a limit has a probability of 1/2. All samples share the
+    same draws (common random numbers): the results are reproducible for a
+    seed, and samples are compared without the noise of separate draws. The
+    comparisons run in float32, in blocks of CHUNK draws.
+
+    Args:
+        q_alb (array_like): QAlb values.
+        q_ig (array_like): QIg values, same shape as q_alb.
+        q_alb_max (float or array_like): QAlb reference, see classify.
+        ig (str): Immunoglobulin of q_ig, see Curves.IMMUNOGLOBULINS.
+        cv_alb (float): Coefficient of variation of QAlb.
+        cv_ig (float): Coefficient of variation of QIg.
+        draws (int): Perturbed (QAlb, QIg) pairs per sample.
+        seed (int): Seed of the draws.
+
+    Returns:
+        Probabilities: Probability of QIg above Qlim(upper) and of QAlb above
+        q_alb_max, nan where a quotient is missing or not positive.
+    """
+    q_alb, q_ig, q_alb_max = np.broadcast_arrays(
+        np.asarray(q_alb, dtype=float),
+        np.asarray(q_ig, dtype=float),
+        np.asarray(q_alb_max, dtype=float),
+    )
+    shape = q_alb.shape
+    q_alb, q_ig, q_alb_max = q_alb.ravel(), q_ig.ravel(), q_alb_max.ravel()
+
+    rng = np.random.default_rng(seed)
+    noise_alb = np.exp(np.sqrt(np.log1p(cv_alb**2)) * rng.standard_normal(draws))
+    noise_ig = np.exp(np.sqrt(np.log1p(cv_ig**2)) * rng.standard_normal(draws))
+    noise_alb = noise_alb.astype(np.float32)
+    noise_ig = noise_ig.astype(np.float32)
+
+    # Quotients are positive, the squared comparison below relies on it
+    with np.errstate(invalid="ignore"):
+        known = np.flatnonzero(
+            np.isfinite(q_alb) & np.isfinite(q_ig) & (q_alb > 0) & (q_ig > 0)
+        )
+    synthesis = np.full(q_alb.shape, np.nan)
+    barrier = np.full(q_alb.shape, np.nan)
+
+    # QAlb alone decides the barrier, count the draws above the limit
+    with np.errstate(divide="ignore"):
+        ratio = q_alb_max[known] / q_alb[known]
+    above = np.searchsorted(np.sort(noise_alb), ratio, side="right")
+    barrier[known] = 1 - above / draws
+
+    # QIg > Qlim(upper) squared, both sides being positive for QIg > 0 and
+    # c > 0: (QIg / scale + c)^2 > (a/b)^2 (QAlb^2 + b^2)
+    upper = IMMUNOGLOBULINS[ig].upper
+    noise_alb2 = np.square(noise_alb)
+    offset = np.float32(upper.ab**2 * upper.b2)
+    rows = max(CHUNK // draws, 1)
+    columns = min(draws, CHUNK)
+    lhs = np.empty((rows, columns), np.float32)
+    rhs = np.empty((rows, columns), np.float32)
+    counts = np.zeros(len(known))
+    for start in range(0, len(known), rows):
+        samples = known[start : start + rows]
+        q = (q_ig[samples] / upper.scale).astype(np.float32)[:, None]
+        k = (upper.ab**2 * np.square(q_alb[samples])).astype(np.float32)[:, None]
+        for first in range(0, draws, columns):
+            block = slice(first, first + columns)
+            left = lhs[: len(samples), : len(noise_ig[block])]
+            right = rhs[: len(samples), : len(noise_ig[block])]
+            np.multiply(q, noise_ig[block], out=left)
+            left += np.float32(upper.c)
+            np.square(left, out=left)
+            np.multiply(k, noise_alb2[block], out=right)
+            right += offset
+            counts[start : start + len(samples)] += np.count_nonzero(
+                left > right, axis=1
+            )
+    synthesis[known] = counts / draws
+
+    return Probabilities(synthesis.reshape(shape), barrier.reshape(shape))
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class ReiberCurve:
+    """
+    Reiber hyperbola QIg = a/b * sqrt(QAlb^2 + b^2) - c.
+
+    Args:
+        ab (float): a/b.
+        b2 (float): b^2.
+        c (float): c.
+        scale (float): Factor applied to the curve, the percentage lines of
+            the diagram are the upper curve scaled by 1 / (1 - fraction).
+    """
+
+    def __init__(self, ab, b2, c, scale=1.0):
+        self.ab = ab
+        self.b2 = b2
+        self.c = c
+        self.scale = scale
+
+    def __repr__(self):
+        return (
+            f"ReiberCurve(ab={self.ab!r}, b2={self.b2!r}, c={self.c!r}, "
+            f"scale={self.scale!r})"
+        )
+
+    def eval(self, q_alb):
+        """
+        Return QIg on the curve for scalar or array QAlb values.
+        """
+        return (self.ab * np.sqrt(np.square(q_alb) + self.b2) - self.c) * self.scale
+
+    __call__ = eval
+
+    def inverse(self, q_ig):
+        """
+        Return the QAlb at which the curve reaches q_ig.
+
+        Values below the curve at QAlb = 0 have no intersection and give nan.
+        """
+        with np.errstate(invalid="ignore"):
+            return np.sqrt(
+                np.square((np.asarray(q_ig) / self.scale + self.c) / self.ab) - self.b2
+            )
+
+    def scaled(self, scale):
+        """
+        Return a copy of the curve multiplied by scale.
+        """
+        return ReiberCurve(self.ab, self.b2, self.c, self.scale * scale)
+
+
+# Quotients are entered and listed x 10^-3, like the tick labels
+CONVERSION_FACTOR = 1e-3
+
+# Axes of the diagram, shared by all immunoglobulins
+X_MIN = 1.5e-3
+X_MAX = 130e-3
+Y_MIN = 0.3e-3
+Y_MAX = 130e-3
+Y_TICKS = [0.5e-3, 1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3]
+X_TICKS = [2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3]
+Y_TICKS_L = [".5", 1, 2, 5, 10, 20, 50, "$\mathregular{100_{x10^{-3}}}$"]
+X_TICKS_L = [2, 5, 10, "$\mathregular{20_{x10^{-3}}}$", 50, 100]
+VERTICAL_LINES_X = [5e-3, 6.5e-3, 8e-3]
+UPPER_LINERS = ["20", "40", "60", "80%"]
+
+
+class Immunoglobulin:
+    """
+    Parameter set of one Reibergram.
+
+    Args:
+        name (str): IgG, IgA or IgM.
+        upper (ReiberCurve): Upper limit, Qlim(upper).
+        lower (ReiberCurve): Lower limit, Qlim(lower).
+        vertical_ymin (list): Lower ends of the vertical lines. By default
+            the first two are drawn 2.3/4.2 and 2.3/4.3 of their height and
+            the last one down to the lower limit.
+    """
+
+    def __init__(self, name, upper, lower, vertical_ymin=None):
+        self.name = name
+        self.label = f"Q{name}"
+        self.upper = upper
+        self.lower = lower
+
+        self.x_ticks = X_TICKS
+        self.x_ticks_l = X_TICKS_L
+        self.y_ticks = Y_TICKS
+        self.y_ticks_l = Y_TICKS_L
+
+        # 20, 40, 60 and 80% intrathecal fraction lines
+        self.top_limit = [upper.scaled(1 / (1 - f)) for f in (0.2, 0.4, 0.6, 0.8)]
+
+        self.vertical_lines_x = VERTICAL_LINES_X
+        self.vertical_ymax = [upper.eval(x) for x in self.vertical_lines_x]
+        if vertical_ymin is None:
+            vertical_ymin = [
+                2.3 * self.vertical_ymax[0] / 4.2,
+                2.3 * self.vertical_ymax[1] / 4.3,
+                lower.eval(self.vertical_lines_x[2]),
+            ]
+        self.vertical_ymin = vertical_ymin
+
+    def __repr__(self):
+        return f"Immunoglobulin({self.name!r}, {self.upper!r}, {self.lower!r})"
+
+
+IMMUNOGLOBULINS = {
+    "IgG": Immunoglobulin(
+        "IgG",
+        ReiberCurve(0.93, 6e-6, 1.7e-3),
+        ReiberCurve(0.33, 2e-6, 0.3e-3),
+        vertical_ymin=[2.3e-3, 3.2e-3, 2.4e-3],
+    ),
+    "IgA": Immunoglobulin(
+        "IgA",
+        ReiberCurve(0.77, 23e-6, 3.1e-3),
+        ReiberCurve(0.17, 74e-6, 1.3e-3),
+    ),
+    "IgM": Immunoglobulin(
+        "IgM",
+        ReiberCurve(0.67, 120e-6, 7.1e-3),
+        ReiberCurve(0.04, 442e-6, 0.82e-3),
+    ),
+}
@@ -1,7 +1,10 @@
 import os
-import datetime
-import matplotlib.pyplot as plt
-from App import plot_reibergram
+import time
+from Journal import FAILED, JOURNAL_NAME, QUEUED, RENDERING, WRITTEN, Journal
+from Quotients import parse_quotient
+from Report import DOCUMENTS_FOLDER, create_date_folder, generate_word
+from Store import STORE_NAME, Store
+from Timing import record
 from PyQt5.QtWidgets import (
     QApplication,
     QPushButton,
@@ -11,25 +14,71 @@ from PyQt5.QtWidgets import (
     QGridLayout,
     QMessageBox,
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 from PyQt5.QtGui import QKeyEvent
-from docx import Document
-from docx.shared import Pt, Cm
-from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
 
 # Constants for document format settings
 WORD_FORMAT = "Word (.docx)"
 
 
-def create_date_folder():
-    today = datetime.date.today()
-    folder_name = today.strftime("%Y-%m-%d")
-    folder_path = os.path.join("Tüm Belgeler", folder_name)
+class ReportSignals(QObject):
+    finished = pyqtSignal(str, float)  # barcode, seconds
+    failed = pyqtSignal(str, str)  # barcode, error
 
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
 
-    return folder_path
+class ReportJob(QRunnable):
+    """
+    Generate one Word report on a QThreadPool thread.
+
+    The state of the job is kept in the journal and the saved sample is
+    recorded in the store, the outcome is reported back to the window
+    through the finished and failed signals.
+
+    Args:
+        journal (Journal): Job journal.
+        store (Store): Sample store.
+        job_id (int): Journal ID of the job.
+        row (dict): name, age, sex, barcode, qigg, qalb, qiga and qigm.
+        folder_path (str): Folder of the report.
+    """
+
+    def __init__(self, journal, store, job_id, row, folder_path):
+        super().__init__()
+        self.journal = journal
+        self.store = store
+        self.job_id = job_id
+        self.row = row
+        self.folder_path = folder_path
+        self.signals = ReportSignals()
+
+    def run(self):
+        barcode = self.row["barcode"]
+        start = time.perf_counter()
+        try:
+            self.journal.mark(self.job_id, RENDERING)
+            doc_path = generate_word(
+                self.row["qigg"],
+                self.row["qalb"],
+                self.row["name"],
+                self.row["age"],
+                self.row["sex"],
+                barcode,
+                self.folder_path,
+                self.row["qiga"],
+                self.row["qigm"],
+                concurrent=True,
+            )
+            self.journal.mark(self.job_id, WRITTEN)
+            self.store.record(self.row, doc_path)
+        except Exception as error:
+            self.journal.mark(self.job_id, FAILED, str(error))
+            self.signals.failed.emit(barcode, str(error))
+        else:
+            self.signals.finished.emit(barcode, time.perf_counter() - start)
+
+
+# Placeholder of the quotient fields, see Quotients.parse_quotient
+QUOTIENT_HINT = "x10^-3 ya da BOS ve serum: 28 mg/l 10 g/l"
 
 
 class DataEntryWindow(QWidget):
@@ -40,6 +89,8 @@ class DataEntryWindow(QWidget):
         "Örnek Numarası:",
         "QIgG:",
         "QAlb:",
+        "QIgA:",
+        "QIgM:",
     ]
 
     def __init__(self):
@@ -56,17 +107,32 @@ class DataEntryWindow(QWidget):
         self.add_input(layout, "Örnek Numarası:")
         self.add_input(layout, "QIgG:")
         self.add_input(layout, "QAlb:")
+        self.add_input(layout, "QIgA:")
+        self.add_input(layout, "QIgM:")
+        # Quotients are typed x 10^-3, or as CSF and serum concentrations
+        for label_text in ["QIgG:", "QAlb:", "QIgA:", "QIgM:"]:
+            self.input_widgets[label_text].setPlaceholderText(QUOTIENT_HINT)
 
         self.submit_button = QPushButton("Kaydet")
         self.submit_button.clicked.connect(self.save_data)
-        layout.addWidget(self.submit_button, 7, 0, 1, 2)
+        layout.addWidget(self.submit_button, 9, 0, 1, 2)
         self.submit_button.setFixedWidth(120)
 
         self.reset_button = QPushButton("Temizle")
         self.reset_button.clicked.connect(self.reset_fields)
-        layout.addWidget(self.reset_button, 8, 0, 1, 2)
+        layout.addWidget(self.reset_button, 10, 0, 1, 2)
         self.reset_button.setFixedWidth(80)
 
+        # Progress and errors of the reports being generated
+        self.status_label = QLabel()
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label, 11, 0, 1, 2)
+
+        self.thread_pool = QThreadPool(self)
+        self.jobs_in_flight = 0
+        self.journal = Journal(os.path.join(DOCUMENTS_FOLDER, JOURNAL_NAME))
+        self.store = Store(os.path.join(DOCUMENTS_FOLDER, STORE_NAME))
+
         # Create a hidden button for the "Enter" key action
         self.hidden_button = QPushButton("HiddenButton")
         self.hidden_button.setHidden(True)
@@ -82,6 +148,10 @@ class DataEntryWindow(QWidget):
         self.submit_button.setDefault(True)  # This makes it respond to the Enter key
         self.setWindowTitle("Hasta Bilgileri")
 
+        # Finish the reports left unsaved by a crash or power cut
+        for job_id, folder_path, row in self.journal.unfinished():
+            self.submit_report(job_id, row, folder_path)
+
     def eventFilter(self, obj, event):
         if event.type() == QKeyEvent.KeyPress:
             if event.key() in [Qt.Key_Return, Qt.Key_Down]:
@@ -145,6 +215,8 @@ class DataEntryWindow(QWidget):
         barcode = self.input_widgets["Örnek Numarası:"].text()
         qigg = self.input_widgets["QIgG:"].text()
         qalb = self.input_widgets["QAlb:"].text()
+        qiga = self.input_widgets["QIgA:"].text()
+        qigm = self.input_widgets["QIgM:"].text()
 
         # Validate inputs
         if not all([name, age, gender, barcode, qigg, qalb]):
@@ -167,104 +239,94 @@ class DataEntryWindow(QWidget):
 
         try:
             age = int(age)
-            qigg = float(qigg) / 1000
-            qalb = float(qalb) / 1000
+            qigg = parse_quotient(qigg) / 1000
+            qalb = parse_quotient(qalb) / 1000
+            # QIgA and QIgM are optional
+            qiga = parse_quotient(qiga) / 1000 if qiga else None
+            qigm = parse_quotient(qigm) / 1000 if qigm else None
         except ValueError:
             QMessageBox.warning(
                 self,
                 "Validasyon Hatası!",
-                "Lütfen geçerli bir Yaş, QIgG veya QAlb değeri giriniz.",
+                "Lütfen geçerli bir Yaş, QIgG, QAlb, QIgA veya QIgM değeri giriniz. "
+                "Oranlar x10^-3 olarak ya da birimleriyle BOS ve serum "
+                "konsantrasyonları olarak girilir, örneğin 28 mg/l 10 g/l.",
                 QMessageBox.Ok,
             )
             return
 
-        # Call the function to generate the Word document with information and the Reibergram plot
+        # A report still being saved is only recorded in the store once it is
+        # written, refuse to queue its sample ID a second time until then
         folder_path = create_date_folder()
-        self.generate_word(
-            qigg, qalb, name.upper(), age, gender.upper(), barcode, folder_path
-        )
+        if self.journal.state(barcode, folder_path) in (QUEUED, RENDERING):
+            QMessageBox.warning(
+                self,
+                "Tekrarlanan Örnek No",
+                f"{barcode} numaralı örneğin raporu hâlâ kaydediliyor. "
+                "Lütfen tekrar girmeden önce kaydedilmesini bekleyiniz.",
+                QMessageBox.Ok,
+            )
+            return
+
+        # Sample IDs are unique, ask before saving an earlier sample again. Its
+        # report is only overwritten when it is in today's folder
+        sample = self.store.find(barcode)
+        if sample is not None:
+            earlier_folder = os.path.dirname(sample["path"])
+            if os.path.abspath(earlier_folder) == os.path.abspath(folder_path):
+                action = "Raporun üzerine yazılsın mı?"
+            else:
+                action = (
+                    "Yeni rapor bugünün klasörüne kaydedilecek, "
+                    f"{earlier_folder} klasöründeki önceki rapor korunacak. "
+                    "Kaydedilsin mi?"
+                )
+            answer = QMessageBox.question(
+                self,
+                "Tekrarlanan Örnek No",
+                f"{barcode} numaralı örnek {sample['date']} tarihinde "
+                f"{sample['name']} için zaten kaydedildi. {action}",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if answer != QMessageBox.Yes:
+                return
+
+        # Generate the Word document with information and the Reibergram plot
+        # in the background, so the next sample can be entered right away
+        row = {
+            "name": name.upper(),
+            "age": age,
+            "sex": gender.upper(),
+            "barcode": barcode,
+            "qigg": qigg,
+            "qalb": qalb,
+            "qiga": qiga,
+            "qigm": qigm,
+        }
+        job_id = self.journal.queue(barcode, folder_path, row)
+        self.submit_report(job_id, row, folder_path)
 
         # Reset the input fields
         self.reset_fields()
-        QMessageBox.information(
-            self,
-            "Veriler Kaydedildi",
-            "Kaydedildi.",
-            QMessageBox.Ok,
-        )
 
-    def generate_word(self, Qigg, Qalbumin, name, age, gender, barcode, folder_path):
-        doc_name = f"{barcode}.docx"
-        plot_file = f"{barcode}.png"
-        IgA = "IgA.png"
-        IgM = "IgM.png"
-        doc_path = os.path.join(folder_path, doc_name)
-
-        # Create a Word document
-        doc = Document()
-        plot_reibergram(Qigg, Qalbumin, barcode)
-
-        # Add collected information to the Word document
-        info_text = f"\nAdı Soyadı: {name}\nCinsiyeti, yaşı: {gender}/{age}\nÖrnek No: {barcode}\nRapor Tarihi: {datetime.date.today().strftime('%d.%m.%Y')}"
-
-        table = doc.add_table(rows=3, cols=2)
-        table.autofit = False
-
-        # Set the column widths
-        table.columns[0].width = Cm(6.43)
-        table.columns[1].width = Cm(6.43)
-
-        for i, row in enumerate(table.rows):
-            for j, cell in enumerate(row.cells):
-                if i == 0:
-                    if j == 0:
-                        # First cell in the first row - add text
-                        paragraph = cell.add_paragraph(info_text)
-                        paragraph.paragraph_format.line_spacing_rule = (
-                            WD_LINE_SPACING.SINGLE
-                        )
-                        run = paragraph.runs[0]
-                        run.font.size = Pt(12)
-                        run.font.bold = True
-                        run.font.name = "Times New Roman"
-                    elif j == 1:
-                        # Second cell in the first row - add image
-                        text = ["BOS/Serum quotient diagramları \n(Reibergram)"]
-                        paragraph = cell.add_paragraph()
-                        paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        paragraph.paragraph_format.line_spacing_rule = (
-                            WD_LINE_SPACING.SINGLE
-                        )
-                        p_run = paragraph.add_run(text)
-                        p_run.font.size = Pt(12)
-                        p_run.font.bold = True
-                        p_run.font.name = "Times New Roman"
-
-                        cell.paragraphs[1].format_alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        run = cell.paragraphs[1].add_run()
-                        run.add_picture(plot_file, width=Cm(6.6), height=Cm(6.4))
-                elif i == 1:
-                    if j == 0:
-                        pass
-                    elif j == 1:
-                        # Second cell in the second row - add image
-                        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        run = cell.paragraphs[0].add_run()
-                        run.add_picture(IgA, width=Cm(6.6), height=Cm(6.4))
-                else:
-                    if j == 0:
-                        pass
-                    else:
-                        # Second cell in the third row - add image
-                        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-                        run = cell.paragraphs[0].add_run()
-                        run.add_picture(IgM, width=Cm(6.6), height=Cm(6.4))
-
-        # Save the Word document
-        doc.save(doc_path)
-
-        # Close the plot to free up memory
-        plt.close()
-
-        # Delete the plot file
-        os.remove(plot_file)
+    def submit_report(self, job_id, row, folder_path):
+        job = ReportJob(self.journal, self.store, job_id, row, folder_path)
+        job.signals.finished.connect(self.report_finished)
+        job.signals.failed.connect(self.report_failed)
+        self.jobs_in_flight += 1
+        self.thread_pool.start(job)
+        self.show_status(f"{self.jobs_in_flight} rapor kaydediliyor...")
+
+    def show_status(self, text, error=False):
+        self.status_label.setStyleSheet("color: red;" if error else "")
+        self.status_label.setText(text)
+
+    def report_finished(self, barcode, seconds):
+        self.jobs_in_flight -= 1
+        record("report.job", seconds, barcode=barcode)
+        self.show_status(f"{barcode} kaydedildi ({seconds:.2f} sn).")
+
+    def report_failed(self, barcode, error):
+        self.jobs_in_flight -= 1
+        self.show_status(f"{barcode} kaydedilemedi: {error}", error=True)
@@ -0,0 +1,161 @@
+import argparse
+import datetime
+import os
+
+import numpy as np
+
+from Curves import X_MAX, X_MIN, Y_MAX, Y_MIN
+
+# Bins per axis, on the log QAlb and log QIg axes of the diagram. Stores
+# count samples into these bins, changing it needs Store.rebuild_density.
+BINS = 64
+
+# Colormap of the density layer, white where there are no samples
+COLORMAP = "YlOrBr"
+
+
+def bin_index(q_alb, q_ig, bins=BINS):
+    """
+    Return the bins of samples, counted from the bottom left of the diagram.
+
+    Args:
+        q_alb (array_like): QAlb values.
+        q_ig (array_like): QIg values.
+        bins (int): Bins per axis.
+
+    Returns:
+        tuple: QAlb and QIg bin indices as numpy.intp arrays, and a mask of
+        the samples inside the axes.
+    """
+    q_alb, q_ig = np.broadcast_arrays(
+        np.asarray(q_alb, dtype=float), np.asarray(q_ig, dtype=float)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.log10(q_alb / X_MIN) / np.log10(X_MAX / X_MIN) * bins
+        y = np.log10(q_ig / Y_MIN) / np.log10(Y_MAX / Y_MIN) * bins
+    inside = (x >= 0) & (x < bins) & (y >= 0) & (y < bins)
+    x = np.where(inside, x, 0).astype(np.intp)
+    y = np.where(inside, y, 0).astype(np.intp)
+    return x, y, inside
+
+
+class Density:
+    """
+    2D histogram of a cohort on the log-log bins of the Reibergram.
+
+    Adding a sample only increments its bin, and drawing the layer costs
+    the same for ten samples as for ten thousand, see
+    App.ReibergramRenderer.render_density.
+
+    Args:
+        bins (int): Bins per axis.
+    """
+
+    def __init__(self, bins=BINS):
+        self.bins = bins
+        # Rows are QIg bins from the bottom, columns QAlb bins from the left
+        self.counts = np.zeros((bins, bins), dtype=np.int64)
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def add(self, q_alb, q_ig, count=1):
+        """
+        Count samples, skipping those outside the axes or with a missing
+        quotient.
+        """
+        x, y, inside = bin_index(q_alb, q_ig, self.bins)
+        np.add.at(self.counts, (y[inside], x[inside]), count)
+
+    @classmethod
+    def from_store(cls, store, month=None, ig="IgG"):
+        """
+        Load the counts a store keeps for a month.
+
+        Args:
+            store (Store.Store): Sample store.
+            month (str): Month in YYYY-MM format, the current one if None.
+            ig (str): Immunoglobulin, IgG, IgA or IgM.
+        """
+        density = cls()
+        for x, y, count in store.density(month or current_month(), ig):
+            density.counts[y, x] = count
+        return density
+
+    def edges(self):
+        """
+        Return the QAlb and QIg edges of the bins.
+        """
+        return (
+            np.geomspace(X_MIN, X_MAX, self.bins + 1),
+            np.geomspace(Y_MIN, Y_MAX, self.bins + 1),
+        )
+
+    def colors(self):
+        """
+        Return the layer as an RGB image of the bins, top row first.
+
+        The counts are scaled logarithmically, so that single outliers stay
+        visible next to the crowded normal zone.
+        """
+        from matplotlib import colormaps
+
+        table = colormaps[COLORMAP](np.linspace(0, 1, 256))[:, :3]
+        table = np.round(table * 255).astype(np.uint8)
+        table[0] = 255
+        level = np.log1p(self.counts[::-1]) / np.log1p(max(self.counts.max(), 1))
+        return table[np.round(level * 255).astype(np.intp)]
+
+
+def current_month():
+    return datetime.date.today().isoformat()[:7]
+
+
+def main(argv=None):
+    import matplotlib.image as mpimg
+
+    from App import get_renderer
+    from Report import DOCUMENTS_FOLDER
+    from Store import STORE_NAME, Store
+
+    parser = argparse.ArgumentParser(
+        description="Draw the density of a month's samples on the Reibergram."
+    )
+    parser.add_argument(
+        "-m", "--month", default=current_month(), help="YYYY-MM (default: %(default)s)"
+    )
+    parser.add_argument(
+        "-i",
+        "--ig",
+        default="IgG",
+        choices=["IgG", "IgA", "IgM"],
+        help="immunoglobulin (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-s",
+        "--store",
+        default=os.path.join(DOCUMENTS_FOLDER, STORE_NAME),
+        help="sample store (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-o", "--output", default="density.png", help="PNG file (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="count the stored samples again, for stores saved before the counts",
+    )
+    args = parser.parse_args(argv)
+
+    store = Store(args.store)
+    if args.rebuild:
+        store.rebuild_density()
+    density = Density.from_store(store, args.month, args.ig)
+    image = get_renderer(args.ig).render_density(density)
+    mpimg.imsave(args.output, image, format="png")
+    print(f"{len(density)} samples of {args.month} drawn to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
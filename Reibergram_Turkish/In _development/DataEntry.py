@@ -1,7 +1,8 @@
+import io
 import os
 import datetime
-import matplotlib.pyplot as plt
-from App import plot_reibergram
+from App import render_reibergram
+from Report import generate_pdf
 from PyQt5.QtWidgets import (
     QApplication,
     QPushButton,
@@ -14,8 +15,6 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, QSettings
 from PyQt5.QtGui import QKeyEvent
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from docx import Document
 from docx.shared import Pt
 from docx.shared import Inches
@@ -233,13 +232,12 @@ class DataEntryWindow(QWidget):
 
     def generate_word(self, Qigg, Qalbumin, name, age, gender, barcode, folder_path):
         doc_name = f"{barcode}.docx"
-        plot_file = f"{barcode}.png"
         doc_path = os.path.join(folder_path, doc_name)
 
         # Create a Word document
         doc = Document()
 
-        plot_reibergram(Qigg, Qalbumin, barcode)
+        plot_file = io.BytesIO(render_reibergram(Qigg, Qalbumin))
 
         # Add collected information to the Word document
         info_text = f"Adı Soyadı: {name}\nYaşı: {age}\nCinsiyeti: {gender}\nÖrnek Numarası: {barcode}\nRapor Tarihi: {datetime.date.today()}"
@@ -258,56 +256,21 @@ class DataEntryWindow(QWidget):
         # Save the Word document
         doc.save(doc_path)
 
-        # Close the plot to free up memory
-        plt.close()
-
-        # Delete the plot file
-        os.remove(plot_file)
-
     def generate_pdf(self, Qigg, Qalbumin, name, age, gender, barcode, folder_path):
         pdf_name = f"{barcode}.pdf"
-        plot_file = f"{barcode}.png"
         pdf_path = os.path.join(folder_path, pdf_name)
 
-        # Create a PDF document
-        c = canvas.Canvas(pdf_path, pagesize=letter)
-
-        # Add collected information to the PDF document with line breaks
-        info_lines = [
-            f"Adı Soyadı: {name}",
-            f"Yaşı: {age}",
-            f"Cinsiyeti: {gender}",
-            f"Örnek Numarası: {barcode}",
-            f"Rapor Tarihi: {datetime.date.today()}",
-        ]
-
-        x = 100  # X-coordinate for the text
-        y = 750  # Initial Y-coordinate for the text
-
-        # Set the font and font size
-        font_name = "Helvetica"
-        font_size = 12
-
-        for line in info_lines:
-            c.setFont(font_name, font_size)
-            c.drawString(x, y, line)
-            y -= font_size * 1.2  # Adjust the line spacing as needed
-
-        plot_reibergram(Qigg, Qalbumin, barcode)
-
-        # Add the plot image to the PDF document
-        c.drawImage(
-            plot_file, 100, 50, width=350, height=350
-        )  # Adjust position, width, and height as needed
-
-        # Save the PDF document
-        c.save()
-
-        # Close the plot to free up memory
-        plt.close()
-
-        # Delete the plot file
-        os.remove(plot_file)
+        # One page of the worklist PDF, the diagram background is shared
+        # with Batch --pdf
+        row = {
+            "name": name,
+            "age": age,
+            "sex": gender,
+            "barcode": barcode,
+            "qigg": Qigg,
+            "qalb": Qalbumin,
+        }
+        generate_pdf([row], pdf_path)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,26 @@
+import time
+
+# Start of the application for the start-up time records, taken before the
+# PyQt5 and application imports
+LAUNCH = time.perf_counter()
+
 import sys
 import os
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from MainWindow import MainWindow
 
 if __name__ == "__main__":
+    # Reibergrams are rendered in worker processes, also in the frozen app
+    multiprocessing.freeze_support()
+
     # Create a directory to store all documents
     if not os.path.exists("Tüm Belgeler"):
         os.makedirs("Tüm Belgeler")
 
     data_entries = []
     app = QApplication(sys.argv)
-    main_window = MainWindow()
+    main_window = MainWindow(LAUNCH)
     main_window.show()
     sys.exit(app.exec_())
 
@@ -0,0 +1,477 @@
+import contextlib
+import copy
+import io
+import os
+import datetime
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from App import get_renderer, render_reibergram
+from Curves import IMMUNOGLOBULINS
+from Timing import stage
+from docx import Document
+from docx.shared import Pt, Cm
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_LINE_SPACING
+
+DOCUMENTS_FOLDER = "Tüm Belgeler"
+
+
+def create_date_folder():
+    today = datetime.date.today()
+    folder_name = today.strftime("%Y-%m-%d")
+    folder_path = os.path.join(DOCUMENTS_FOLDER, folder_name)
+
+    if not os.path.exists(folder_path):
+        os.makedirs(folder_path)
+
+    return folder_path
+
+
+# One single-worker pool per immunoglobulin, each keeping its diagram warm
+_render_pools = {}
+_render_pools_lock = threading.Lock()
+
+
+def get_render_pool(ig):
+    with _render_pools_lock:
+        if ig not in _render_pools:
+            _render_pools[ig] = ProcessPoolExecutor(
+                max_workers=1, initializer=get_renderer, initargs=(ig, True)
+            )
+        return _render_pools[ig]
+
+
+def submit_render(ig, Qig, Qalbumin):
+    """
+    Start rendering a diagram in the worker process of its immunoglobulin.
+
+    Returns:
+        tuple: The pool and the future of the palette PNG, see render_result.
+    """
+    pool = get_render_pool(ig)
+    try:
+        return pool, pool.submit(render_reibergram, Qig, Qalbumin, ig, "palette")
+    except BrokenProcessPool:
+        drop_render_pool(ig, pool)
+        raise
+
+
+def render_result(ig, pool, future):
+    """
+    Wait for a diagram started by submit_render.
+    """
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        drop_render_pool(ig, pool)
+        raise
+
+
+def drop_render_pool(ig, pool):
+    """
+    Forget a pool whose worker process died. A broken pool fails every task
+    submitted to it, the next get_render_pool call starts a new one.
+    """
+    with _render_pools_lock:
+        if _render_pools.get(ig) is pool:
+            del _render_pools[ig]
+    pool.shutdown(wait=False)
+
+
+def render_reibergrams(quotients, Qalbumin, concurrent=False):
+    """
+    Render the patient's Reibergrams.
+
+    Args:
+        quotients (dict): QIgG, QIgA and QIgM values keyed by immunoglobulin,
+            missing or None values are not rendered.
+        Qalbumin (float): QAlb value.
+        concurrent (bool): Render the diagrams at the same time, each in its
+            own worker process, instead of one after the other.
+
+    Returns:
+        dict: Palette PNG bytes keyed by immunoglobulin, sized to the report
+        table cells.
+    """
+    quotients = {ig: Qig for ig, Qig in quotients.items() if Qig is not None}
+    if concurrent:
+        futures = {
+            ig: submit_render(ig, Qig, Qalbumin) for ig, Qig in quotients.items()
+        }
+        return {ig: render_result(ig, *future) for ig, future in futures.items()}
+    return {
+        ig: render_reibergram(Qig, Qalbumin, ig, "palette")
+        for ig, Qig in quotients.items()
+    }
+
+
+# Reibergram cells of the report table, besides the IgG diagram. The images
+# are next to this file, whatever the working directory.
+STATIC_DIAGRAMS = {
+    ig: os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{ig}.png")
+    for ig in ("IgA", "IgM")
+}
+CAPTION = "BOS/Serum quotient diagramları \n(Reibergram)"
+PICTURE_SIZE = {"width": Cm(6.6), "height": Cm(6.4)}
+
+# Parsed report templates keyed by the static diagrams they contain. They
+# are only ever deep-copied: reading them would cache sub-elements (the
+# body, its tables) that a deep copy no longer shares with the document.
+_templates = {}
+# Reports are generated from several threads by the data entry window
+_templates_lock = threading.Lock()
+
+
+def build_template(static):
+    """
+    Lay out the patient-independent part of the report.
+
+    The table, column widths, fonts and caption are set up and the static
+    diagrams listed in static are embedded. The patient's text and diagrams
+    go into the empty runs left in their cells.
+
+    Args:
+        static (tuple): Immunoglobulins whose static diagram is embedded.
+
+    Returns:
+        bytes: The template as a .docx file.
+    """
+    doc = Document()
+
+    table = doc.add_table(rows=3, cols=2)
+    table.autofit = False
+
+    # Set the column widths
+    table.columns[0].width = Cm(6.43)
+    table.columns[1].width = Cm(6.43)
+
+    # First cell in the first row - patient information
+    paragraph = table.cell(0, 0).add_paragraph()
+    paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE
+    run = paragraph.add_run()
+    run.font.size = Pt(12)
+    run.font.bold = True
+    run.font.name = "Times New Roman"
+
+    # Second cell in the first row - caption and IgG diagram
+    paragraph = table.cell(0, 1).add_paragraph()
+    paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    paragraph.paragraph_format.line_spacing_rule = WD_LINE_SPACING.SINGLE
+    p_run = paragraph.add_run(CAPTION)
+    p_run.font.size = Pt(12)
+    p_run.font.bold = True
+    p_run.font.name = "Times New Roman"
+    paragraph.add_run()
+
+    # Second cell in the second and third row - IgA and IgM diagrams
+    for row, ig in enumerate(STATIC_DIAGRAMS, start=1):
+        paragraph = table.cell(row, 1).paragraphs[0]
+        paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = paragraph.add_run()
+        if ig in static:
+            run.add_picture(STATIC_DIAGRAMS[ig], **PICTURE_SIZE)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def new_document(static):
+    """
+    Return a copy of the report template, built on first use.
+    """
+    static = tuple(sorted(static))
+    with _templates_lock:
+        if static not in _templates:
+            _templates[static] = Document(io.BytesIO(build_template(static)))
+        return copy.deepcopy(_templates[static])
+
+
+def patient_info(name, age, gender, barcode):
+    """
+    Return the patient block of the report, one field per line after a
+    leading empty line.
+    """
+    return f"\nAdı Soyadı: {name}\nCinsiyeti, yaşı: {gender}/{age}\nÖrnek No: {barcode}\nRapor Tarihi: {datetime.date.today().strftime('%d.%m.%Y')}"
+
+
+def generate_word(
+    Qigg,
+    Qalbumin,
+    name,
+    age,
+    gender,
+    barcode,
+    folder_path,
+    Qiga=None,
+    Qigm=None,
+    concurrent=False,
+):
+    doc_name = f"{barcode}.docx"
+    doc_path = os.path.join(folder_path, doc_name)
+
+    with stage("report.render", barcode=barcode):
+        plots = render_reibergrams(
+            {"IgG": Qigg, "IgA": Qiga, "IgM": Qigm}, Qalbumin, concurrent
+        )
+
+    # Copy of the template, with static diagrams where QIgA or QIgM is unknown
+    with stage("report.template", barcode=barcode):
+        doc = new_document(ig for ig in STATIC_DIAGRAMS if ig not in plots)
+    table = doc.tables[0]
+
+    with stage("report.fill", barcode=barcode):
+        # Add collected information to the Word document
+        info_text = patient_info(name, age, gender, barcode)
+        table.cell(0, 0).paragraphs[1].runs[0].text = info_text
+
+        # Add the patient's diagrams
+        run = table.cell(0, 1).paragraphs[1].runs[1]
+        run.add_picture(io.BytesIO(plots["IgG"]), **PICTURE_SIZE)
+        for row, ig in enumerate(STATIC_DIAGRAMS, start=1):
+            if ig in plots:
+                run = table.cell(row, 1).paragraphs[0].runs[0]
+                run.add_picture(io.BytesIO(plots[ig]), **PICTURE_SIZE)
+
+    # Save the Word document
+    with stage("report.save", barcode=barcode):
+        save_document(doc, doc_path)
+    return doc_path
+
+
+@contextlib.contextmanager
+def replacing(path):
+    """
+    Yield a temporary file in the folder of path, unique to this writer, and
+    move it over path on success or remove it on error. An interrupted save
+    never leaves a truncated report behind, and concurrent saves of one
+    sample ID do not write into each other's file.
+    """
+    fd, part_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+    os.close(fd)
+    try:
+        # mkstemp makes the file readable by its owner only
+        os.chmod(part_path, 0o644)
+        yield part_path
+        os.replace(part_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(part_path)
+        raise
+
+
+def save_document(doc, doc_path):
+    """
+    Write a document atomically, see replacing.
+    """
+    with replacing(doc_path) as part_path:
+        with open(part_path, "wb") as file:
+            doc.save(file)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+DOCUMENT_XML = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+PAGE_BREAK = b'<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+
+def generate_combined_word(rows, doc_path, concurrent=False):
+    """
+    Write the reports of a worklist into one Word document, one table and
+    page per patient.
+
+    The package is written directly: the static IgA and IgM diagrams stay
+    in the media part once and every table refers to them, each patient's
+    diagrams are written to the file as soon as they are rendered, and the
+    document body goes through a temporary file, so memory use does not
+    grow with the number of patients.
+
+    Args:
+        rows (list of dict): name, age, sex, barcode, qigg, qalb, qiga and
+            qigm of each sample, see Batch.normalize_row.
+        doc_path (str): Word document, written atomically.
+        concurrent (bool): Render each patient's diagrams at the same time.
+
+    Returns:
+        str: doc_path.
+    """
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    from docx.oxml.ns import qn
+    from docx.oxml.parser import parse_xml
+    from docx.oxml.shape import CT_Inline
+    from docx.table import Table
+    from lxml import etree
+
+    with replacing(doc_path) as part_path:
+        template = build_template(tuple(STATIC_DIAGRAMS))
+        source = zipfile.ZipFile(io.BytesIO(template))
+        target = zipfile.ZipFile(part_path, "w", zipfile.ZIP_DEFLATED)
+        body = tempfile.TemporaryFile()
+        rels = tempfile.TemporaryFile()
+        with source, target, body, rels:
+            # Styles, settings, static media and so on are taken as they are
+            for info in source.infolist():
+                if info.filename not in (DOCUMENT_XML, DOCUMENT_RELS):
+                    target.writestr(info, source.read(info))
+
+            # The template's table is copied per patient, in between the opening
+            # of the body and the section properties
+            document = parse_xml(source.read(DOCUMENT_XML))
+            template_table = document.find(qn("w:body")).find(qn("w:tbl"))
+            template_table.getparent().remove(template_table)
+            head, tail = etree.tostring(
+                document, xml_declaration=True, encoding="UTF-8", standalone=True
+            ).split(b"<w:sectPr", 1)
+            tail = b"<w:sectPr" + tail
+            rels_head, rels_tail = source.read(DOCUMENT_RELS).split(b"</Relationships>")
+            rels_tail = b"</Relationships>" + rels_tail
+
+            shape_id = 0
+            for index, row in enumerate(rows):
+                with stage("combined.render", barcode=row["barcode"]):
+                    plots = render_reibergrams(
+                        {"IgG": row["qigg"], "IgA": row["qiga"], "IgM": row["qigm"]},
+                        row["qalb"],
+                        concurrent,
+                    )
+
+                with stage("combined.page", barcode=row["barcode"]):
+                    element = copy.deepcopy(template_table)
+                    table = Table(element, None)
+                    table.cell(0, 0).paragraphs[1].runs[0].text = patient_info(
+                        row["name"], row["age"], row["sex"], row["barcode"]
+                    )
+
+                    runs = {"IgG": table.cell(0, 1).paragraphs[1].runs[1]}
+                    for cell_row, ig in enumerate(STATIC_DIAGRAMS, start=1):
+                        runs[ig] = table.cell(cell_row, 1).paragraphs[0].runs[0]
+                    for ig, png in plots.items():
+                        name = f"patient{index}{ig}.png"
+                        rId = f"rIdPatient{index}{ig}"
+                        # PNG is compressed already
+                        target.writestr(f"word/media/{name}", png, zipfile.ZIP_STORED)
+                        rels.write(
+                            f'<Relationship Id="{rId}" Type="{RT.IMAGE}" '
+                            f'Target="media/{name}"/>'.encode()
+                        )
+                        # Replaces the static diagram in the IgA and IgM cells
+                        run = runs[ig]._r
+                        for drawing in run.findall(qn("w:drawing")):
+                            run.remove(drawing)
+                        run.add_drawing(
+                            CT_Inline.new_pic_inline(
+                                0,
+                                rId,
+                                name,
+                                PICTURE_SIZE["width"],
+                                PICTURE_SIZE["height"],
+                            )
+                        )
+
+                    # Drawing ids are unique within a document
+                    for doc_pr in element.iter(qn("wp:docPr")):
+                        shape_id += 1
+                        doc_pr.set("id", str(shape_id))
+
+                    if index:
+                        body.write(PAGE_BREAK)
+                    body.write(etree.tostring(element))
+
+            with stage("combined.save"):
+                for name, start, part, end in (
+                    (DOCUMENT_XML, head, body, tail),
+                    (DOCUMENT_RELS, rels_head, rels, rels_tail),
+                ):
+                    part.seek(0)
+                    with target.open(name, "w") as file:
+                        file.write(start)
+                        shutil.copyfileobj(part, file)
+                        file.write(end)
+
+    return doc_path
+
+
+# Page layout of the PDF report, in points
+PDF_FONT = "DejaVuSans.ttf"
+PDF_TEXT_POSITION = (100, 750)
+PDF_DIAGRAM_BOX = (100, 50, 350, 350)
+
+
+def generate_pdf(rows, pdf_path):
+    """
+    Write the IgG reports of a worklist into one multi-page PDF.
+
+    The vector diagram is embedded once, as a form XObject referenced by
+    every page, and only the patient's text, guide lines and point are drawn
+    per page, also as vectors.
+
+    Args:
+        rows (list of dict): name, age, sex, barcode, qigg and qalb of each
+            sample, quotients as fractions, see Batch.normalize_row.
+        pdf_path (str): PDF file, written atomically.
+
+    Returns:
+        str: pdf_path.
+    """
+    import matplotlib
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    from Vector import register_font
+
+    # Matplotlib's DejaVu Sans covers the Turkish letters, only the glyphs
+    # used are embedded
+    font_name = register_font(
+        os.path.join(matplotlib.get_data_path(), "fonts", "ttf", PDF_FONT)
+    )
+
+    renderer = get_renderer("IgG")
+    drawing = renderer.vector()
+    x0, y0, width, height = PDF_DIAGRAM_BOX
+    # The diagram keeps its aspect ratio, centered in the box
+    scale = min(width / drawing.width, height / drawing.height)
+    x0 += (width - drawing.width * scale) / 2
+    y0 += (height - drawing.height * scale) / 2
+
+    with replacing(pdf_path) as part_path:
+        c = canvas.Canvas(part_path, pagesize=letter, pageCompression=1)
+        with stage("pdf.background"):
+            drawing.form(c, "IgG")
+
+        for row in rows:
+            with stage("pdf.page", barcode=row["barcode"]):
+                text = c.beginText(*PDF_TEXT_POSITION)
+                text.setFont(font_name, 12)
+                text.setLeading(12 * 1.2)
+                info = patient_info(row["name"], row["age"], row["sex"], row["barcode"])
+                for line in info.strip().split("\n"):
+                    text.textLine(line)
+                c.drawText(text)
+
+                c.saveState()
+                c.translate(x0, y0)
+                c.scale(scale, scale)
+                c.doForm("IgG")
+                renderer.draw_pdf_overlay(c, row["qigg"], row["qalb"])
+                c.restoreState()
+                c.showPage()
+
+        with stage("pdf.save"):
+            c.save()
+    return pdf_path
+
+
+def warm_up():
+    """
+    Start the render workers, wait until each has drawn its diagram, and
+    build the report templates.
+    """
+    futures = {ig: submit_render(ig, None, None) for ig in IMMUNOGLOBULINS}
+    for static in ((), ("IgA",), ("IgM",), ("IgA", "IgM")):
+        new_document(static)
+    for ig, future in futures.items():
+        render_result(ig, *future)
@@ -0,0 +1,253 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from Classify import ZONE_NAMES, classify, q_alb_limit
+from Density import bin_index
+
+STORE_NAME = "samples.sqlite3"
+
+# Immunoglobulins with a quotient column in the store
+IGS = ("IgG", "IgA", "IgM")
+
+# Quotients as fractions, zones as in Classify and IgIF in percent
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    barcode TEXT NOT NULL,
+    name TEXT NOT NULL COLLATE NOCASE,
+    age INTEGER NOT NULL,
+    sex TEXT NOT NULL,
+    qalb REAL NOT NULL,
+    qigg REAL,
+    zone_igg INTEGER,
+    igif_igg REAL,
+    qiga REAL,
+    zone_iga INTEGER,
+    igif_iga REAL,
+    qigm REAL,
+    zone_igm INTEGER,
+    igif_igm REAL,
+    date TEXT NOT NULL,
+    saved REAL NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS samples_barcode ON samples (barcode);
+CREATE INDEX IF NOT EXISTS samples_name ON samples (name);
+CREATE INDEX IF NOT EXISTS samples_date ON samples (date);
+
+-- Samples per month and Density bin, kept up to date by Store.record
+CREATE TABLE IF NOT EXISTS density (
+    month TEXT NOT NULL,
+    ig TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (month, ig, x, y)
+) WITHOUT ROWID;
+"""
+
+
+class Store:
+    """
+    Indexed store of the saved samples: inputs, Reibergram zones and the
+    path of each report, one row per sample ID.
+
+    Args:
+        path (str): Store database, created when missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        """
+        Open a connection, commit on success and close it afterwards.
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def record(self, row, path):
+        """
+        Record a saved report, replacing an earlier one of the same sample.
+
+        Args:
+            row (dict): name, age, sex, barcode, qigg, qalb, qiga and qigm,
+                quotients as fractions and None where unknown.
+            path (str): Path of the report.
+        """
+        values = {
+            "barcode": row["barcode"],
+            "name": row["name"],
+            "age": row["age"],
+            "sex": row["sex"],
+            "qalb": row["qalb"],
+            "date": datetime.date.today().isoformat(),
+            "saved": time.time(),
+            "path": path,
+        }
+        for ig in IGS:
+            key = f"q{ig.lower()}"
+            q_ig = row.get(key)
+            values[key] = q_ig
+            values[f"zone_{ig.lower()}"] = None
+            values[f"igif_{ig.lower()}"] = None
+            if q_ig is not None:
+                result = classify(row["qalb"], q_ig, q_alb_limit(row["age"]), ig)
+                values[f"zone_{ig.lower()}"] = int(result.zone)
+                values[f"igif_{ig.lower()}"] = float(result.igif)
+
+        columns = ", ".join(values)
+        placeholders = ", ".join(f":{column}" for column in values)
+        updates = ", ".join(
+            f"{column} = excluded.{column}" for column in values if column != "barcode"
+        )
+        with self.connect() as connection:
+            earlier = connection.execute(
+                "SELECT * FROM samples WHERE barcode = ?", (row["barcode"],)
+            ).fetchone()
+            if earlier is not None:
+                self.count_density(connection, earlier, -1)
+            connection.execute(
+                f"INSERT INTO samples ({columns}) VALUES ({placeholders})"
+                f" ON CONFLICT (barcode) DO UPDATE SET {updates}",
+                values,
+            )
+            self.count_density(connection, values, 1)
+
+    @staticmethod
+    def count_density(connection, sample, step):
+        """
+        Add step to the density bins of a sample, one per known quotient.
+        """
+        for ig in IGS:
+            q_ig = sample[f"q{ig.lower()}"]
+            if q_ig is None:
+                continue
+            x, y, inside = bin_index(sample["qalb"], q_ig)
+            if inside:
+                connection.execute(
+                    "INSERT INTO density (month, ig, x, y, count)"
+                    " VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (month, ig, x, y) DO UPDATE"
+                    " SET count = count + excluded.count",
+                    (sample["date"][:7], ig, int(x), int(y), step),
+                )
+
+    def find(self, barcode):
+        """
+        Return the sample saved under a sample ID as a dict, None if unknown.
+        """
+        with self.connect() as connection:
+            sample = connection.execute(
+                "SELECT * FROM samples WHERE barcode = ?", (barcode,)
+            ).fetchone()
+        return dict(sample) if sample else None
+
+    def density(self, month, ig="IgG"):
+        """
+        Return the density counts of a month.
+
+        Args:
+            month (str): Month in YYYY-MM format.
+            ig (str): Immunoglobulin, IgG, IgA or IgM.
+
+        Returns:
+            list of tuple: QAlb bin, QIg bin and number of samples, see
+            Density.bin_index.
+        """
+        with self.connect() as connection:
+            return [
+                tuple(cell)
+                for cell in connection.execute(
+                    "SELECT x, y, count FROM density"
+                    " WHERE month = ? AND ig = ? AND count > 0",
+                    (month, ig),
+                )
+            ]
+
+    def rebuild_density(self):
+        """
+        Count all stored samples into the density bins again.
+        """
+        with self.connect() as connection:
+            connection.execute("DELETE FROM density")
+            for sample in connection.execute("SELECT * FROM samples").fetchall():
+                self.count_density(connection, sample, 1)
+
+    def search(self, name=None, date=None, limit=100):
+        """
+        Return the samples of a patient and/or a day, newest first.
+
+        Args:
+            name (str): Beginning of the patient name, case insensitive.
+            date (str): Day in YYYY-MM-DD format.
+            limit (int): Maximum number of samples.
+
+        Returns:
+            list of dict: Stored samples.
+        """
+        conditions = []
+        parameters = []
+        if name:
+            # A range on the name index, names are saved in upper case
+            conditions.append("name >= ? AND name < ?")
+            parameters += [name.upper(), name.upper() + "\U0010ffff"]
+        if date:
+            conditions.append("date = ?")
+            parameters.append(date)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.connect() as connection:
+            samples = connection.execute(
+                f"SELECT * FROM samples{where} ORDER BY saved DESC LIMIT ?",
+                (*parameters, limit),
+            ).fetchall()
+        return [dict(sample) for sample in samples]
+
+
+def main(argv=None):
+    from Report import DOCUMENTS_FOLDER
+
+    parser = argparse.ArgumentParser(description="Look up saved samples.")
+    parser.add_argument("barcode", nargs="?", help="sample ID")
+    parser.add_argument("-n", "--name", help="beginning of the patient name")
+    parser.add_argument("-d", "--date", help="day of the report, YYYY-MM-DD")
+    parser.add_argument(
+        "-s",
+        "--store",
+        default=os.path.join(DOCUMENTS_FOLDER, STORE_NAME),
+        help="sample store (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    store = Store(args.store)
+    if args.barcode:
+        sample = store.find(args.barcode)
+        samples = [sample] if sample else []
+    else:
+        samples = store.search(args.name, args.date)
+    for sample in samples:
+        print(
+            f"{sample['date']}  {sample['barcode']}  {sample['name']}  "
+            f"{ZONE_NAMES[sample['zone_igg']]}  {sample['path']}"
+        )
+    return 0 if samples else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,406 @@
+import argparse
+import datetime
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from App import get_renderer
+from Batch import normalize_row, read_rows, render_report
+from Journal import FAILED, JOURNAL_NAME, RENDERING, WRITTEN, Journal
+from Quotients import add_quotients
+from Report import DOCUMENTS_FOLDER, create_date_folder
+from Store import STORE_NAME, Store
+
+# Seconds between two scans of the drop folder
+POLL_INTERVAL = 0.5
+
+# A micro-batch is rendered once it has BATCH_SIZE rows or its first row
+# has waited MAX_DELAY seconds, whichever comes first
+BATCH_SIZE = 8
+MAX_DELAY = 1.0
+
+# Subfolders of the drop folder the exports are moved to once read
+PROCESSED = "processed"
+REJECTED = "rejected"
+
+EXPORTS = (".csv", ".txt", ".xlsx", ".xlsm", ".hl7", ".astm")
+
+
+def age_from_birth_date(value, today=None):
+    """
+    Return the age in years of a YYYYMMDD[HHMM...] birth date.
+    """
+    born = datetime.datetime.strptime(value[:8], "%Y%m%d").date()
+    today = today or datetime.date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+
+def observation(raw, identifier, value, units, components):
+    """
+    Record an observation under each component of its identifier, so that
+    either the code or the text can match a worklist header.
+    """
+    for name in identifier.split(components):
+        if name:
+            raw.setdefault(name, value)
+            raw.setdefault(f"{name} units", units)
+
+
+def patient_fields(name, birth_date, sex, components):
+    family, _, given = name.partition(components)
+    given = given.split(components)[0]
+    raw = {"name": f"{given} {family}".strip(), "sex": sex}
+    if birth_date:
+        raw["age"] = age_from_birth_date(birth_date)
+    return raw
+
+
+def parse_hl7(text):
+    """
+    Read the observations of HL7 v2 ORU messages, one row per order.
+
+    PID-5, PID-7 and PID-8 give the name, birth date and sex, OBR-3 (or
+    OBR-2) the sample ID, and each OBX its value under the code and the
+    text of OBX-3.
+
+    Returns:
+        list of dict: Raw rows, see Batch.normalize_row.
+    """
+    rows = []
+    patient = {}
+    separator, components = "|", "^"
+    for segment in text.replace("\r\n", "\r").replace("\n", "\r").split("\r"):
+        if segment.startswith("MSH"):
+            separator, components = segment[3], segment[4]
+        fields = segment.split(separator)
+        fields += [""] * (9 - len(fields))
+        if fields[0] == "PID":
+            patient = patient_fields(fields[5], fields[7], fields[8], components)
+        elif fields[0] == "OBR":
+            barcode = (fields[3] or fields[2]).split(components)[0]
+            rows.append({**patient, "sample id": barcode})
+        elif fields[0] == "OBX" and rows:
+            observation(rows[-1], fields[3], fields[5], fields[6], components)
+    return rows
+
+
+def parse_astm(text):
+    """
+    Read the results of an ASTM E1394 (LIS2-A2) transfer, one row per order.
+
+    The P record gives the name, birth date and sex, the O record the
+    sample ID, and each R record its value under the test ID.
+
+    Returns:
+        list of dict: Raw rows, see Batch.normalize_row.
+    """
+    rows = []
+    patient = {}
+    separator, components = "|", "^"
+    for line in text.splitlines():
+        # Captured transfers keep the frame number and control characters
+        line = line.strip("\x02\x03\x04\x05\x06\x15\x17 ")
+        if len(line) > 2 and line[0].isdigit() and line[2] == separator:
+            line = line[1:]
+        if line.startswith("H"):
+            separator, components = line[1], line[3]
+            continue
+        fields = line.split(separator)
+        fields += [""] * (9 - len(fields))
+        if fields[0] == "P":
+            patient = patient_fields(fields[5], fields[7], fields[8], components)
+        elif fields[0] == "O":
+            barcode = fields[2].split(components)[0]
+            rows.append({**patient, "sample id": barcode})
+        elif fields[0] == "R" and rows:
+            observation(rows[-1], fields[2], fields[3], fields[4], components)
+    return rows
+
+
+def read_export(path):
+    """
+    Read the raw rows of an analyzer or LIS export: HL7, ASTM, or a CSV or
+    Excel worklist.
+    """
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return read_rows(path)
+    with open(path, encoding="utf-8-sig", errors="replace") as file:
+        text = file.read()
+    start = text.lstrip("\x02\x05 \r\n")
+    if start.startswith("MSH"):
+        return parse_hl7(text)
+    if start[:2] == "H|" or start[1:3] == "H|":
+        return parse_astm(text)
+    return read_rows(path)
+
+
+def render_batch(batch):
+    """
+    Render the reports of a micro-batch in a worker process.
+
+    Args:
+        batch (list of tuple): Job ID, row and folder of each report.
+
+    Returns:
+        list of tuple: Job ID, report path and None, or job ID, None and
+        the error of a report that failed.
+    """
+    results = []
+    for job_id, row, folder in batch:
+        try:
+            results.append((job_id, render_report(row, folder), None))
+        except Exception as error:
+            results.append((job_id, None, str(error) or type(error).__name__))
+    return results
+
+
+class Watcher:
+    """
+    Turn analyzer exports dropped into a folder into reports.
+
+    A file is read once its size and modification time stayed the same for
+    one scan, so that it is not read while still being written. Its rows
+    are validated like a worklist and queued in the journal, then the file
+    is moved to the processed subfolder. The queued rows are rendered in
+    micro-batches by warm worker processes and recorded in the store.
+
+    Args:
+        folder (str): Drop folder.
+        journal (Journal.Journal): Job journal, jobs it has not finished are
+            rendered again on start.
+        store (Store.Store): Sample store.
+        workers (int): Worker processes.
+        output (str): Folder of the reports, today's folder if None.
+    """
+
+    def __init__(self, folder, journal, store, workers=None, output=None):
+        self.folder = folder
+        self.journal = journal
+        self.store = store
+        self.workers = workers or os.cpu_count()
+        self.output = output
+        if output:
+            os.makedirs(output, exist_ok=True)
+        self.sizes = {}
+        self.pending = []
+        self.oldest = None
+        self.futures = {}
+        for job_id, job_folder, row in journal.unfinished():
+            self.queue(job_id, row, job_folder)
+
+    def queue(self, job_id, row, folder):
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append((job_id, row, folder))
+
+    def pending_index(self, barcode):
+        """
+        Return the index in pending of a barcode, None if it is not queued.
+        """
+        for index, (_, row, _) in enumerate(self.pending):
+            if row["barcode"] == barcode:
+                return index
+        return None
+
+    def rendering(self, barcode):
+        """
+        Return whether a barcode is in a micro-batch being rendered.
+        """
+        return any(
+            row["barcode"] == barcode
+            for rows in self.futures.values()
+            for row in rows.values()
+        )
+
+    def scan(self):
+        """
+        Return the exports that did not change since the previous scan.
+        """
+        ready = []
+        sizes = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(EXPORTS):
+                    continue
+                stat = entry.stat()
+                sizes[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                if self.sizes.get(entry.path) == sizes[entry.path]:
+                    ready.append(entry.path)
+        self.sizes = sizes
+        return sorted(ready)
+
+    def ingest(self, path):
+        """
+        Validate and queue the rows of an export, then move it out of the
+        drop folder.
+        """
+        try:
+            raws = read_export(path)
+        except Exception as error:
+            print(f"{path}: rejected, {error}")
+            self.move(path, REJECTED)
+            return
+
+        folder = self.output or create_date_folder()
+        queued = 0
+        errors = add_quotients(raws)
+        for line, (raw, error) in enumerate(zip(raws, errors), start=2):
+            try:
+                if error:
+                    raise ValueError(error)
+                row = normalize_row(raw)
+            except ValueError as error:
+                print(f"{path}:{line}: skipped, {error}")
+                continue
+            index = self.pending_index(row["barcode"])
+            if index is not None and self.pending[index][2] != folder:
+                print(f"{row['barcode']}: skipped, already queued for another folder")
+                continue
+            job_id = self.journal.queue(row["barcode"], folder, row)
+            if index is None:
+                self.queue(job_id, row, folder)
+            else:
+                # A later export or line of the same sample replaces the queued row
+                self.pending[index] = (job_id, row, folder)
+            # A sample being rendered stays queued until its batch is done, see
+            # flush, so that a corrected export is rendered after it
+            queued += 1
+        self.move(path, PROCESSED if queued else REJECTED)
+
+    def move(self, path, subfolder):
+        target = os.path.join(self.folder, subfolder)
+        os.makedirs(target, exist_ok=True)
+        name = os.path.basename(path)
+        if os.path.exists(os.path.join(target, name)):
+            stem, extension = os.path.splitext(name)
+            name = f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}{extension}"
+        os.replace(path, os.path.join(target, name))
+        self.sizes.pop(path, None)
+
+    def flush(self, executor, force=False):
+        """
+        Submit the pending rows in micro-batches, as long as the workers
+        are not all busy. Rows of samples still being rendered wait.
+        """
+        while self.pending and len(self.futures) < 2 * self.workers:
+            ready = [
+                index
+                for index, (_, row, _) in enumerate(self.pending)
+                if not self.rendering(row["barcode"])
+            ]
+            if not ready:
+                return
+            waited = time.monotonic() - self.oldest
+            if len(ready) < BATCH_SIZE and waited < MAX_DELAY and not force:
+                return
+            batch = [self.pending[index] for index in ready[:BATCH_SIZE]]
+            taken = set(ready[:BATCH_SIZE])
+            self.pending = [
+                entry for index, entry in enumerate(self.pending) if index not in taken
+            ]
+            for job_id, _, _ in batch:
+                self.journal.mark(job_id, RENDERING)
+            rows = {job_id: row for job_id, row, _ in batch}
+            self.futures[executor.submit(render_batch, batch)] = rows
+        if not self.pending:
+            self.oldest = None
+
+    def collect(self, timeout):
+        """
+        Record the finished micro-batches, waiting at most timeout seconds.
+        """
+        done, _ = wait(self.futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            rows = self.futures.pop(future)
+            try:
+                results = future.result()
+            except Exception as error:
+                results = [(job_id, None, str(error)) for job_id in rows]
+            queued = {job_id for job_id, _, _ in self.pending}
+            for job_id, doc_path, error in results:
+                row = rows[job_id]
+                # A row of the sample queued again meanwhile stays queued
+                # in the journal, it is rendered next
+                if error is None:
+                    if job_id not in queued:
+                        self.journal.mark(job_id, WRITTEN)
+                    self.store.record(row, doc_path)
+                    print(f"{row['barcode']}: written to {doc_path}")
+                else:
+                    if job_id not in queued:
+                        self.journal.mark(job_id, FAILED, error)
+                    print(f"{row['barcode']}: failed, {error}")
+
+    def run(self, once=False):
+        """
+        Watch the folder until interrupted, or until the exports present at
+        the start are rendered if once is set.
+        """
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=get_renderer,
+            initargs=("IgG", True),
+        ) as executor:
+            if once:
+                # Files are not being written, read them without waiting
+                self.scan()
+            while True:
+                for path in self.scan():
+                    self.ingest(path)
+                self.flush(executor, force=once)
+                if once and not self.pending and not self.futures:
+                    return
+                if self.futures:
+                    self.collect(POLL_INTERVAL)
+                else:
+                    time.sleep(POLL_INTERVAL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render reports for the analyzer exports (CSV, Excel, HL7 "
+        "or ASTM) dropped into a folder."
+    )
+    parser.add_argument("folder", help="drop folder to watch")
+    parser.add_argument(
+        "-o", "--output", help="folder for the reports (default: today's folder)"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--journal",
+        help=f"job journal (default: {JOURNAL_NAME} in the drop folder)",
+    )
+    parser.add_argument(
+        "-s",
+        "--store",
+        default=os.path.join(DOCUMENTS_FOLDER, STORE_NAME),
+        help="sample store the written reports are recorded in "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="render the exports already in the folder and exit",
+    )
+    args = parser.parse_args(argv)
+
+    journal = Journal(args.journal or os.path.join(args.folder, JOURNAL_NAME))
+    watcher = Watcher(
+        args.folder, journal, Store(args.store), args.workers, args.output
+    )
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())